@@ -0,0 +1,277 @@
+"""Summary analytics computed with NumPy.
+
+The database does the row-level work it is good at (filtering and GROUP BY on
+indexed columns), and the small result sets come back as NumPy columns.  All
+the statistics are then vectorised over every group at once: score
+distributions per quiz, percent-correct per question, a user's moving
+average, and per-subject weekly trends.
+
+Results are cached per data version like the charts, so a page view only
+recomputes after new scores or catalog changes.  The admin summary aggregates
+every score, and every submit moves the scores version, so it is cached per
+catalog version instead and recomputed at most every ``ANALYTICS_ADMIN_TTL``
+seconds.  NumPy is imported on first use to keep startup fast.
+"""
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import Integer, case, cast, func, literal, select
+
+from cache import LRUCache
+from models import db, Subject, Chapter, Quiz, Question, Score, Attempt, Answer
+
+np = None  # numpy, imported on first use
+
+Distribution = namedtuple("Distribution", "quiz_id quiz_name attempts mean std p25 median p75 mean_pct")
+Difficulty = namedtuple("Difficulty", "question_id title quiz_name answered pct_correct")
+Trend = namedtuple("Trend", "subject_name attempts mean_pct weekly_change")
+MovingAverage = namedtuple("MovingAverage", "timestamps scores_pct average window")
+
+WEEK_SECONDS = 7 * 24 * 3600
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(maxsize=current_app.config["ANALYTICS_CACHE_SIZE"])
+    return _cache
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+def _columns(rows, dtypes):
+    """Transposes result rows into one NumPy array per column."""
+    _load_numpy()
+    rows = list(rows)
+    return [np.fromiter((row[i] for row in rows), dtype=dtype, count=len(rows)) for i, dtype in enumerate(dtypes)]
+
+
+def _group_starts(keys):
+    """Start offsets of the runs of equal values in a sorted key column."""
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.int64)
+
+
+def _score_pct(score_column, total_column):
+    return case((total_column > 0, 100.0 * func.coalesce(score_column, 0) / total_column), else_=literal(0.0))
+
+
+def epoch_seconds(column):
+    """SQL expression for a DateTime column as Unix seconds (SQLite and PostgreSQL)."""
+    if db.engine.dialect.name == "postgresql":
+        return func.extract("epoch", column)
+    return (func.julianday(column) - 2440587.5) * 86400.0
+
+
+def time_bucket(column, unit):
+    """SQL expression truncating a DateTime column to the start of its day, week (Monday) or month."""
+    if db.engine.dialect.name == "postgresql":
+        return func.date_trunc(unit, column)
+    if unit == "day":
+        return func.date(column)
+    if unit == "week":
+        return func.date(column, "weekday 0", "-6 days")
+    return func.strftime("%Y-%m-01", column)
+
+
+# score distributions.......................
+
+
+def quiz_distributions(limit=10):
+    """Score distribution of the most attempted quizzes, as a list of ``Distribution``."""
+    # One row per (quiz, score) with its frequency, read from ix_score_quiz_id_total_score
+    _load_numpy()
+    score = func.coalesce(Score.total_score, 0)
+    rows = db.session.execute(
+        select(Score.quiz_id, score, func.count())
+        .group_by(Score.quiz_id, score)
+        .order_by(Score.quiz_id, score)
+    ).all()
+    if not rows:
+        return []
+    quiz_ids, scores, freq = _columns(rows, (np.int64, np.float64, np.int64))
+
+    starts = _group_starts(quiz_ids)
+    attempts = np.add.reduceat(freq, starts)
+    sums = np.add.reduceat(scores * freq, starts)
+    squares = np.add.reduceat(scores * scores * freq, starts)
+    mean = sums / attempts
+    std = np.sqrt(np.maximum(squares / attempts - mean * mean, 0))
+
+    # Weighted percentiles: position of the p-th attempt in each group's cumulative counts
+    cumulative = np.cumsum(freq)
+    before_group = cumulative[starts] - freq[starts]
+
+    def percentile(p):
+        targets = before_group + np.ceil(p * attempts).clip(min=1)
+        return scores[np.searchsorted(cumulative, targets)]
+
+    p25, median, p75 = percentile(0.25), percentile(0.5), percentile(0.75)
+
+    top = np.argsort(-attempts, kind="stable")[:limit]
+    group_quiz_ids = quiz_ids[starts]
+    quizzes = {
+        quiz_id: (name, total_qsn)
+        for quiz_id, name, total_qsn in db.session.execute(
+            select(Quiz.id, Quiz.name, Quiz.total_qsn).where(Quiz.id.in_(group_quiz_ids[top].tolist()))
+        )
+    }
+
+    result = []
+    for i in top:
+        quiz_id = int(group_quiz_ids[i])
+        if quiz_id not in quizzes:
+            continue  # scores of a deleted quiz
+        name, total = quizzes[quiz_id][0], quizzes[quiz_id][1] or 0
+        result.append(Distribution(
+            quiz_id, name, int(attempts[i]), round(float(mean[i]), 2), round(float(std[i]), 2),
+            float(p25[i]), float(median[i]), float(p75[i]),
+            round(100 * float(mean[i]) / total, 1) if total else 0.0,
+        ))
+    return result
+
+
+# question difficulty.......................
+
+
+def question_difficulty(limit=10, min_answers=5):
+    """The hardest questions (lowest percent correct) among submitted attempts."""
+    correct = case((Answer.selected_option == Question.correct_option, 1), else_=0)
+    rows = db.session.execute(
+        select(Answer.question_id, func.count(), func.sum(correct))
+        .join(Question, Question.id == Answer.question_id)
+        .join(Attempt, Attempt.id == Answer.attempt_id)
+        .where(Attempt.submitted_at.is_not(None))
+        .group_by(Answer.question_id)
+    ).all()
+    if not rows:
+        return []
+    _load_numpy()
+    question_ids, answered, right = _columns(rows, (np.int64, np.int64, np.int64))
+
+    enough = answered >= min_answers
+    question_ids, answered, right = question_ids[enough], answered[enough], right[enough]
+    pct = 100.0 * right / np.maximum(answered, 1)
+    hardest = np.lexsort((question_ids, pct))[:limit]
+
+    details = {
+        question_id: (title, quiz_name)
+        for question_id, title, quiz_name in db.session.execute(
+            select(Question.id, Question.question_title, Quiz.name)
+            .join(Quiz, Quiz.id == Question.quiz_id)
+            .where(Question.id.in_(question_ids[hardest].tolist()))
+        )
+    }
+    return [
+        Difficulty(int(question_ids[i]), *details[int(question_ids[i])], int(answered[i]), round(float(pct[i]), 1))
+        for i in hardest if int(question_ids[i]) in details
+    ]
+
+
+# user moving average.......................
+
+
+def moving_average(user_id, window=5):
+    """The user's scores in percent, oldest first, with their ``window``-attempt moving average."""
+    _load_numpy()
+    rows = db.session.execute(
+        select(epoch_seconds(Score.timestamp_of_attempt), _score_pct(Score.total_score, Quiz.total_qsn))
+        .join(Quiz, Quiz.id == Score.quiz_id)
+        .where(Score.user_id == user_id)
+        .order_by(Score.timestamp_of_attempt, Score.id)
+    ).all()
+    timestamps, scores_pct = _columns(rows, (np.float64, np.float64))
+
+    # Mean of the last `window` scores at each point (fewer at the start)
+    sums = np.r_[0.0, np.cumsum(scores_pct)]
+    end = np.arange(1, len(scores_pct) + 1)
+    start = np.maximum(end - window, 0)
+    average = (sums[end] - sums[start]) / (end - start)
+    return MovingAverage(timestamps, scores_pct, average, window)
+
+
+# subject trends.......................
+
+
+def subject_trends(user_id=None, weeks=8):
+    """Per subject, attempts and mean percent over the last ``weeks`` weeks, and the
+    least-squares change of the weekly mean per week (for one user, or everyone)."""
+    _load_numpy()
+    since = datetime.now(timezone.utc) - timedelta(weeks=weeks)
+    week = cast((epoch_seconds(Score.timestamp_of_attempt) - since.timestamp()) / WEEK_SECONDS, Integer)
+    pct = _score_pct(Score.total_score, Quiz.total_qsn)
+    query = (
+        select(Chapter.subject_id, week, func.count(), func.sum(pct))
+        .join(Quiz, Quiz.id == Score.quiz_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .where(Score.timestamp_of_attempt >= since.replace(tzinfo=None))
+        .group_by(Chapter.subject_id, week)
+        .order_by(Chapter.subject_id, week)
+    )
+    if user_id is not None:
+        query = query.where(Score.user_id == user_id)
+    rows = db.session.execute(query).all()
+    if not rows:
+        return []
+    subject_ids, week_index, attempts, pct_sums = _columns(rows, (np.int64, np.float64, np.int64, np.float64))
+
+    starts = _group_starts(subject_ids)
+    total_attempts = np.add.reduceat(attempts, starts)
+    mean_pct = np.add.reduceat(pct_sums, starts) / total_attempts
+
+    # Slope of weekly mean against week number, for every subject at once:
+    # sum(w * (x - x̄)(y - ȳ)) / sum(w * (x - x̄)^2), weighting each week by its attempts
+    weekly_mean = pct_sums / attempts
+    group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(subject_ids)]))
+    x_bar = np.add.reduceat(week_index * attempts, starts) / total_attempts
+    y_bar = np.add.reduceat(weekly_mean * attempts, starts) / total_attempts
+    dx, dy = week_index - x_bar[group], weekly_mean - y_bar[group]
+    spread = np.add.reduceat(attempts * dx * dx, starts)
+    slope = np.divide(
+        np.add.reduceat(attempts * dx * dy, starts), spread, out=np.zeros(len(starts)), where=spread > 0
+    )
+
+    names = dict(db.session.execute(select(Subject.id, Subject.name)).all())
+    return [
+        Trend(names[int(subject_id)], int(n), round(float(mean), 1), round(float(change), 1))
+        for subject_id, n, mean, change in zip(subject_ids[starts], total_attempts, mean_pct, slope)
+        if int(subject_id) in names
+    ]
+
+
+# page summaries.......................
+
+
+def user_summary(user_id, version):
+    """The analytics shown on the user's summary page, cached per data version."""
+    def compute():
+        ma = moving_average(user_id)
+        recent = ma.scores_pct[-ma.window:]
+        return {
+            "moving_average": round(float(ma.average[-1]), 1) if len(ma.average) else None,
+            "window": ma.window,
+            "best_pct": round(float(ma.scores_pct.max()), 1) if len(ma.scores_pct) else None,
+            "recent_std": round(float(recent.std()), 1) if len(recent) > 1 else None,
+            "trends": subject_trends(user_id),
+        }
+    return get_cache().get_or_create(("user", user_id, version), compute)
+
+
+def admin_summary(catalog_version):
+    """The analytics shown on the admin summary page, cached per catalog version for ``ANALYTICS_ADMIN_TTL``."""
+    def compute():
+        return {
+            "distributions": quiz_distributions(),
+            "hardest_questions": question_difficulty(),
+            "trends": subject_trends(),
+        }
+    period = int(time.time() // current_app.config["ANALYTICS_ADMIN_TTL"])
+    return get_cache().get_or_create(("admin", catalog_version, period), compute)
@@ -0,0 +1,162 @@
+"""JSON API for taking a quiz in two requests.
+
+The HTML quiz pages cost a full render plus a redirect per question.  A
+script client instead starts an attempt and gets the whole quiz - every
+question and its options, without ``correct_option`` - in one compressed
+response, runs the timer locally, and posts all the answers in one submit:
+
+    POST /api/quizzes/<quiz_id>/attempts   start; 201 with the quiz payload
+    GET  /api/attempts/<attempt_id>        the same payload again (e.g. after a reload)
+    POST /api/attempts/<attempt_id>/submit {"answers": {"<question_id>": "1".."4"}}
+
+The server still enforces the time limit: answers submitted after the
+deadline plus ``SUBMIT_GRACE_SECONDS`` are ignored, and the attempt is closed
+with whatever was saved before.  Responses are gzip-compressed (brotli when
+the ``brotli`` package is installed and the client accepts it).  The HTML
+routes are unchanged for clients without JavaScript.
+"""
+import gzip
+import json
+from datetime import datetime, timezone
+
+from flask import Blueprint, current_app, request, session
+from flask_login import current_user
+
+import attempts
+import quiz_cache
+import score_queue
+
+api = Blueprint("api", __name__, url_prefix="/api")
+
+COMPRESS_MIN_BYTES = 512
+OPTIONS = {"1", "2", "3", "4"}
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is used without it
+    brotli = None
+
+
+def _response(payload, status=200):
+    """JSON response, compressed with the best encoding the client accepts."""
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    response = current_app.response_class(body, status=status, mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = "private, no-store"
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        response.set_data(brotli.compress(body, quality=5))
+        response.content_encoding = "br"
+    elif accepted["gzip"]:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.content_encoding = "gzip"
+    return response
+
+
+def _error(status, message):
+    return _response({"error": message}, status)
+
+
+@api.before_request
+def require_login():
+    if not current_user.is_authenticated:
+        return _error(401, "Log in to use the API.")
+
+
+def _attempt_payload(info, quiz):
+    end = attempts.deadline(info, quiz.time_duration)
+    remaining = (end - datetime.now(timezone.utc)).total_seconds()
+    return {
+        "attempt": {
+            "id": info.id,
+            "started_at": info.started_at.isoformat(),
+            "deadline": end.isoformat(),
+            "remaining_seconds": max(int(remaining), 0),
+        },
+        "quiz": {"id": quiz.id, "name": quiz.name, "time_duration": quiz.time_duration},
+        "questions": [
+            {
+                "id": question.id,
+                "title": question.question_title,
+                "statement": question.question_statement,
+                "options": [question.option1, question.option2, question.option3, question.option4],
+            }
+            for question in (quiz.questions.get(question_id) for question_id in info.question_ids)
+            if question is not None
+        ],
+    }
+
+
+def _own_attempt(attempt_id):
+    """The user's attempt and its quiz snapshot, or an error response."""
+    info = attempts.get_info(attempt_id)
+    if info is None or info.user_id != current_user.id:
+        return None, None, _error(404, "No such attempt.")
+    quiz = quiz_cache.get_quiz(info.quiz_id)
+    if quiz is None:
+        return None, None, _error(404, "The quiz no longer exists.")
+    return info, quiz, None
+
+
+@api.route("/quizzes/<int:quiz_id>/attempts", methods=["POST"])
+def start_attempt(quiz_id):
+    quiz = quiz_cache.get_quiz(quiz_id)
+    if quiz is None:
+        return _error(404, "No such quiz.")
+    info = attempts.start_attempt(current_user.id, quiz)
+    return _response(_attempt_payload(info, quiz), 201)
+
+
+@api.route("/attempts/<int:attempt_id>")
+def get_attempt(attempt_id):
+    info, quiz, error = _own_attempt(attempt_id)
+    if error:
+        return error
+    if attempts.is_submitted(attempt_id):
+        return _error(409, "This attempt has already been submitted.")
+    return _response(_attempt_payload(info, quiz))
+
+
+@api.route("/attempts/<int:attempt_id>/submit", methods=["POST"])
+def submit_attempt(attempt_id):
+    info, quiz, error = _own_attempt(attempt_id)
+    if error:
+        return error
+    if attempts.is_submitted(attempt_id):
+        return _error(409, "This attempt has already been submitted.")
+
+    payload = request.get_json(silent=True)
+    raw = payload.get("answers") if isinstance(payload, dict) else None
+    if not isinstance(raw, dict):
+        return _error(400, 'Expected {"answers": {"<question_id>": "<option 1-4>"}}.')
+    answers = {}
+    for question_id, option in raw.items():
+        option = str(option).removeprefix("option")
+        if str(question_id).isdigit() and int(question_id) in info.question_ids and option in OPTIONS:
+            answers[str(int(question_id))] = option
+
+    late = not attempts.in_time(info, quiz.time_duration)
+    if late:
+        answers = {}  # too late: grade what was saved before the deadline
+
+    # Answers saved earlier (e.g. from the HTML pages) count too
+    score = attempts.grade_answers(attempts.saved_answers(info.id) | answers, quiz)
+    if current_app.config["SCORE_WRITE_BEHIND"]:
+        submitted = score_queue.enqueue(info, score, answers)
+    else:
+        submitted = bool(score_queue.write_batch([score_queue.submission(info, score, answers)]))
+
+    if not submitted:
+        return _error(409, "This attempt has already been submitted.")
+    if session.get('quiz_attempt') == info.id:  # leave another attempt of the HTML pages running
+        attempts.finish()
+    return _response({
+        "attempt_id": info.id,
+        "score": score,
+        "total": len(info.question_ids),
+        "answered": len(answers),
+        "late": late,
+    })
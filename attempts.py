@@ -0,0 +1,177 @@
+"""Server-side quiz attempts.
+
+An ``Attempt`` row holds the question order and start time; the session cookie
+only carries the attempt id and the answers not yet written.  Answers are
+buffered in the session and flushed to ``Answer`` in one batch every
+``ANSWER_FLUSH_SIZE`` answers and on submit, and grading is one query that
+compares ``Answer`` with ``Question.correct_option``.
+"""
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app, session
+from sqlalchemy import bindparam, func, update
+
+from cache import LRUCache
+from models import db, Attempt, Answer, Question, upsert
+
+AttemptInfo = namedtuple("AttemptInfo", "id user_id quiz_id question_ids started_at")
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(maxsize=current_app.config["ATTEMPT_CACHE_SIZE"])
+    return _cache
+
+
+def start_attempt(user_id, quiz):
+    """Creates the attempt for a quiz snapshot and makes it the session's current attempt."""
+    attempt = Attempt(
+        user_id=user_id,
+        quiz_id=quiz.id,
+        question_ids=json.dumps(list(quiz.question_ids)),
+        started_at=datetime.now(timezone.utc),
+    )
+    db.session.add(attempt)
+    db.session.commit()
+
+    session['quiz_attempt'] = attempt.id
+    session['pending_answers'] = {}
+    return get_info(attempt.id)
+
+
+def get_info(attempt_id):
+    """The attempt's immutable header (question order, start time), cached in memory."""
+    return get_cache().get_or_create(attempt_id, lambda: _load_info(attempt_id))
+
+
+def _load_info(attempt_id):
+    attempt = db.session.get(Attempt, attempt_id)
+    if attempt is None:
+        return None
+    started_at = attempt.started_at.replace(tzinfo=timezone.utc)
+    return AttemptInfo(attempt.id, attempt.user_id, attempt.quiz_id, json.loads(attempt.question_ids), started_at)
+
+
+def current_attempt(user_id, quiz_id):
+    """The session's attempt if it belongs to this user and quiz."""
+    attempt_id = session.get('quiz_attempt')
+    if attempt_id is None:
+        return None
+    info = get_info(attempt_id)
+    if info is None or info.user_id != user_id or info.quiz_id != quiz_id:
+        return None
+    return info
+
+
+def deadline(info, time_duration):
+    return info.started_at + timedelta(minutes=time_duration)
+
+
+def record_answer(info, question_id, option):
+    """Buffers one answer in the session, flushing the buffer once it is full."""
+    if question_id not in info.question_ids or not option:
+        return
+    pending = session.get('pending_answers', {})
+    pending[str(question_id)] = option.removeprefix("option")
+    session['pending_answers'] = pending
+    if len(pending) >= current_app.config["ANSWER_FLUSH_SIZE"]:
+        flush_answers(info)
+
+
+def flush_answers(info):
+    """Writes the buffered answers in one batched upsert."""
+    pending = session.get('pending_answers') or {}
+    if pending:
+        write_answers(info.id, pending)
+        db.session.commit()
+    session['pending_answers'] = {}
+
+
+def write_answers(attempt_id, answers):
+    """Upserts ``{question_id: option}`` in the caller's transaction."""
+    rows = [
+        {"attempt_id": attempt_id, "question_id": int(question_id), "selected_option": option}
+        for question_id, option in answers.items()
+    ]
+    stmt = upsert(
+        Answer,
+        {
+            "attempt_id": bindparam("attempt_id"),
+            "question_id": bindparam("question_id"),
+            "selected_option": bindparam("selected_option"),
+        },
+        index_elements=["attempt_id", "question_id"],
+        set_={"selected_option": bindparam("selected_option")},
+    )
+    db.session.execute(stmt, rows)
+
+
+def grade(attempt_id):
+    """Number of correct answers, counted in the database."""
+    return (
+        db.session.query(func.count())
+        .select_from(Answer)
+        .join(Question, Question.id == Answer.question_id)
+        .filter(Answer.attempt_id == attempt_id, Answer.selected_option == Question.correct_option)
+        .scalar()
+    )
+
+
+def grade_with_pending(info, quiz):
+    """Grades the saved answers plus the session's unsaved ones against a quiz snapshot.
+
+    Reads the database but writes nothing, so the score can be shown before
+    the answers are stored.
+    """
+    answers = saved_answers(info.id)
+    answers.update(session.get('pending_answers') or {})
+    return grade_answers(answers, quiz)
+
+
+def saved_answers(attempt_id):
+    """``{question_id: option}`` of the answers already written for the attempt."""
+    return {
+        str(question_id): option
+        for question_id, option in db.session.query(Answer.question_id, Answer.selected_option)
+        .filter(Answer.attempt_id == attempt_id)
+    }
+
+
+def grade_answers(answers, quiz):
+    """Number of ``{question_id: option}`` answers that match the quiz snapshot."""
+    return sum(
+        1 for question_id, option in answers.items()
+        if (question := quiz.questions.get(int(question_id))) is not None and question.correct_option == option
+    )
+
+
+def in_time(info, time_duration, now=None):
+    """True until the attempt's deadline plus ``SUBMIT_GRACE_SECONDS``."""
+    grace = timedelta(seconds=current_app.config["SUBMIT_GRACE_SECONDS"])
+    return (now or datetime.now(timezone.utc)) <= deadline(info, time_duration) + grace
+
+
+def is_submitted(attempt_id):
+    return db.session.query(Attempt.submitted_at).filter(Attempt.id == attempt_id).scalar() is not None
+
+
+def mark_submitted(attempt_id, score, submitted_at=None):
+    """Closes the attempt. Returns False if it had already been submitted."""
+    result = db.session.execute(
+        update(Attempt)
+        .where(Attempt.id == attempt_id, Attempt.submitted_at.is_(None))
+        .values(submitted_at=submitted_at or datetime.now(timezone.utc), score=score)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def finish():
+    """Forgets the session's attempt once it has been submitted."""
+    session.pop('quiz_attempt', None)
+    session.pop('pending_answers', None)
@@ -0,0 +1,60 @@
+"""Password checks per second at different bcrypt work factors.
+
+Runs ``--logins`` password checks from ``--clients`` request threads through
+the password worker pool, once per cost, and prints the throughput and the
+p95 time one login spends waiting and hashing.
+
+    python benchmarks/bench_bcrypt.py --costs 10 11 12 --clients 16 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import passwords  # noqa: E402
+
+
+def bench(app, cost, logins, clients):
+    app.config["BCRYPT_LOG_ROUNDS"] = cost
+    passwords.bcrypt.init_app(app)
+    with app.app_context():
+        password_hash = passwords.hash_password("correct horse")
+
+    def login(_):
+        with app.app_context():
+            start = time.perf_counter()
+            assert passwords.verify_password(password_hash, "correct horse")
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as request_threads:
+        latencies = sorted(request_threads.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    return logins / elapsed, p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--costs", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=16, help="concurrent request threads")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="BCRYPT_MAX_CONCURRENCY")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.update(BCRYPT_MAX_CONCURRENCY=args.workers, BCRYPT_QUEUE_TIMEOUT=600)
+
+    print(f"{args.logins} logins, {args.clients} clients, {args.workers} bcrypt workers")
+    print(f"{'cost':>4} {'logins/s':>10} {'p95 ms':>10}")
+    for cost in args.costs:
+        rate, p95 = bench(app, cost, args.logins, args.clients)
+        print(f"{cost:>4} {rate:>10.1f} {p95 * 1000:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Time to delete a subject as its subtree grows.
+
+Seeds subjects of increasing size into a scratch SQLite database (``--quizzes``
+quizzes each, with ``--questions`` questions and ``--scores`` scores per quiz)
+and deletes each one in its own transaction, first through
+``catalog.delete_subject`` (one DELETE, cascaded by the database) and then,
+for comparison, the ORM way: load the subtree and ``session.delete`` it row by
+row.  The delete time is also how long the write lock is held.
+
+    python benchmarks/bench_cascade_delete.py --quizzes 10 100 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+
+QUIZZES_PER_CHAPTER = 10
+
+
+def seed_subject(name, quizzes, questions, scores, user_id):
+    from models import db, Subject, Chapter, Quiz, Question, Score
+    import stats
+
+    subject = Subject(name=name)
+    db.session.add(subject)
+    db.session.flush()
+    chapters = (quizzes + QUIZZES_PER_CHAPTER - 1) // QUIZZES_PER_CHAPTER
+    db.session.execute(insert(Chapter), [{"subject_id": subject.id, "name": f"{name}.{c}"} for c in range(chapters)])
+    chapter_ids = db.session.execute(db.select(Chapter.id).where(Chapter.subject_id == subject.id)).scalars().all()
+    db.session.execute(insert(Quiz), [
+        {"chapter_id": chapter_ids[q // QUIZZES_PER_CHAPTER], "name": f"{name} quiz {q}", "time_duration": 30,
+         "total_qsn": questions}
+        for q in range(quizzes)
+    ])
+    quiz_ids = db.session.execute(
+        db.select(Quiz.id).where(Quiz.chapter_id.in_(chapter_ids))
+    ).scalars().all()
+    db.session.execute(insert(Question), [
+        {"quiz_id": quiz_id, "question_title": f"Q{n}", "question_statement": "Which one?",
+         "option1": "a", "option2": "b", "option3": "c", "option4": "d", "correct_option": "1"}
+        for quiz_id in quiz_ids for n in range(questions)
+    ])
+    db.session.execute(insert(Score), [
+        {"quiz_id": quiz_id, "user_id": user_id, "total_score": n % (questions + 1)}
+        for quiz_id in quiz_ids for n in range(scores)
+    ])
+    db.session.commit()
+    stats.rebuild_stats()
+    db.session.commit()
+    return subject.id, chapters + len(quiz_ids) * (1 + questions + scores)
+
+
+def delete_bulk(subject_id):
+    import catalog
+    catalog.delete_subject(subject_id)
+
+
+def delete_orm(subject_id):
+    from models import db, Subject, Chapter, Quiz
+    import stats
+
+    subject = db.session.execute(
+        db.select(Subject).where(Subject.id == subject_id).options(
+            selectinload(Subject.chapters).selectinload(Chapter.quizzes).options(
+                selectinload(Quiz.questions), selectinload(Quiz.scores),
+            )
+        )
+    ).scalar_one()
+    stats.forget_quizzes(db.select(Quiz.id).join(Chapter).where(Chapter.subject_id == subject_id))
+    db.session.delete(subject)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quizzes", type=int, nargs="+", default=[10, 100, 1000], help="quizzes per subject")
+    parser.add_argument("--questions", type=int, default=10, help="per quiz")
+    parser.add_argument("--scores", type=int, default=20, help="per quiz")
+    parser.add_argument("--no-orm", action="store_true", help="skip the row-by-row comparison")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="bench_cascade_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+    os.environ.setdefault("BCRYPT_LOG_ROUNDS", "4")
+    from app import create_app
+    from models import db, User, Subject
+    from schema import init_db
+
+    methods = [("bulk", delete_bulk)] + ([] if args.no_orm else [("orm", delete_orm)])
+    app = create_app()
+    with app.app_context():
+        init_db()
+        user = User(username="bench", email="bench@example.com", qualification="-", dob=date(2000, 1, 1),
+                    password_hash="-")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+        print(f"{'method':>6} {'quizzes':>8} {'rows':>9} {'ms':>9} {'rows/ms':>9}")
+        for name, delete in methods:
+            for quizzes in args.quizzes:
+                subject_id, rows = seed_subject(f"{name}{quizzes}", quizzes, args.questions, args.scores, user_id)
+                db.session.expunge_all()
+                start = time.perf_counter()
+                delete(subject_id)
+                db.session.commit()
+                elapsed = (time.perf_counter() - start) * 1000
+                assert db.session.get(Subject, subject_id) is None
+                print(f"{name:>6} {quizzes:>8} {rows:>9} {elapsed:>9.1f} {rows / elapsed:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Cold-start time of the app: ``import app`` plus ``create_app()`` in a fresh interpreter.
+
+Fails (exit 1) if the median is over ``--budget-ms``, if Matplotlib was imported,
+or if building the app touched the database.
+
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 1000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+app.create_app()
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "matplotlib": "matplotlib" in sys.modules,
+}))
+"""
+
+
+def run_once(db_path):
+    env = dict(os.environ, DATABASE_URL="sqlite:///" + db_path)
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "startup.db")
+        results = [run_once(db_path) for _ in range(args.runs)]
+        touched_db = os.path.exists(db_path)
+
+    times = sorted(r["seconds"] * 1000 for r in results)
+    median = statistics.median(times)
+    print(f"cold start over {args.runs} runs: median {median:.0f} ms, min {times[0]:.0f} ms, max {times[-1]:.0f} ms")
+
+    problems = []
+    if median > args.budget_ms:
+        problems.append(f"median {median:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    if any(r["matplotlib"] for r in results):
+        problems.append("matplotlib was imported at startup")
+    if touched_db:
+        problems.append("create_app() opened the database")
+    for problem in problems:
+        print("FAIL:", problem)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Drives the quiz hot paths with concurrent simulated users and reports latency percentiles.
+
+Each student logs in, then repeatedly opens the dashboard, takes a random quiz
+(start -> every question -> submit) and opens the summary page with its
+charts.  Admins log in and alternate between the summary page with its charts
+and searches.  Requests go through the
+Flask test client in-process by default, or to a running server with ``--url``.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/loadtest.py --students 16 --duration 30 \\
+        --save benchmarks/baselines/local.json
+    ... python benchmarks/loadtest.py --compare benchmarks/baselines/local.json
+
+Seed the database first with ``benchmarks/seed.py``.  ``--compare`` exits 1
+if any step's p95 is more than ``--tolerance`` slower than the baseline, and
+warns when the baseline was recorded with a different setup (e.g. another
+``BCRYPT_LOG_ROUNDS``).
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts import ADMIN_CHARTS, USER_CHARTS
+
+SEARCH_TERMS = ("algebra", "optics", "genetics", "quiz", "user1", "poetry calculus")
+
+
+class TestClientSession:
+    """One logged-in browser, in-process."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+    def post(self, path, data):
+        return self.client.post(path, data=data).status_code
+
+
+class HttpSession:
+    """One logged-in browser against a running server (redirects are not followed)."""
+
+    class _NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), self._NoRedirect
+        )
+
+    def _open(self, path, body=None):
+        try:
+            with self.opener.open(self.base_url + path, data=body, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def get(self, path):
+        return self._open(path)
+
+    def post(self, path, data):
+        return self._open(path, urllib.parse.urlencode(data).encode())
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def call(self, step, fn, *args, ok=(200, 302)):
+        start = time.perf_counter()
+        status = fn(*args)
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies[step].append(elapsed)
+            if status not in ok:
+                self.errors[step] += 1
+        return status
+
+
+def student(session, rec, username, quiz_ids, questions_per_quiz, stop, rng):
+    rec.call("login", session.post, "/app_routes.login", {"username": username, "password": "password"}, ok=(302,))
+    while not stop.is_set():
+        rec.call("user_dashboard", session.get, "/dashboard")
+        quiz_id = rng.choice(quiz_ids)
+        rec.call("start_quiz", session.get, f"/start_quiz/{quiz_id}", ok=(302,))
+        for q_index in range(questions_per_quiz):
+            rec.call("quiz_page", session.get, f"/quiz_page/{quiz_id}/{q_index}")
+            direction = "next" if q_index < questions_per_quiz - 1 else "submit"
+            rec.call(
+                "navigate_question", session.post, f"/quiz/{quiz_id}/{q_index}/navigate",
+                {"option": str(rng.randint(1, 4)), "direction": direction}, ok=(302,),
+            )
+        rec.call("submit_quiz", session.get, f"/quiz/{quiz_id}/submit", ok=(302,))
+        rec.call("user_summary", session.get, "/user/summary")
+        for name in USER_CHARTS:
+            rec.call(f"user_chart_{name}", session.get, f"/user/summary/charts/{name}.png")
+
+
+def admin(session, rec, stop, rng):
+    rec.call("admin_login", session.post, "/app_routes.login", {"username": "Admin", "password": "admin123"}, ok=(302,))
+    while not stop.is_set():
+        rec.call("admin_summary", session.get, "/admin/summary")
+        for name in ADMIN_CHARTS:
+            rec.call(f"admin_chart_{name}", session.get, f"/admin/summary/charts/{name}.png")
+        term = urllib.parse.quote(rng.choice(SEARCH_TERMS))
+        rec.call("admin_search", session.get, f"/admin/search?q={term}&type=all")
+
+
+def percentile(sorted_values, p):
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(rec, elapsed):
+    steps = {}
+    for step, values in sorted(rec.latencies.items()):
+        values = sorted(values)
+        steps[step] = {
+            "count": len(values),
+            "errors": rec.errors[step],
+            "rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    total = sum(s["count"] for s in steps.values())
+    return {"elapsed_s": elapsed, "total_requests": total, "rps": total / elapsed, "steps": steps}
+
+
+def print_report(report, baseline=None):
+    print(f"{'step':<20} {'count':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+          + ("  p95 vs baseline" if baseline else ""))
+    for step, s in report["steps"].items():
+        line = (f"{step:<20} {s['count']:>7} {s['errors']:>5} {s['rps']:>8.1f} "
+                f"{s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f}")
+        base = baseline and baseline["steps"].get(step)
+        if base:
+            line += f"  {(s['p95_ms'] / base['p95_ms'] - 1) * 100:+.0f}%"
+        print(line)
+    print(f"total {report['total_requests']} requests in {report['elapsed_s']:.1f} s = {report['rps']:.1f} req/s")
+
+
+def regressions(report, baseline, tolerance):
+    found = []
+    for step, s in report["steps"].items():
+        base = baseline["steps"].get(step)
+        if base and s["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            found.append(f"{step}: p95 {s['p95_ms']:.1f} ms vs baseline {base['p95_ms']:.1f} ms")
+        if s["errors"]:
+            found.append(f"{step}: {s['errors']} errors")
+    return found
+
+
+def setup_differences(report, baseline):
+    """Workload and cost settings that differ from the baseline's, which make the timings incomparable."""
+    base = baseline.get("setup", {})
+    return [
+        f"{key} is {report['setup'][key]!r}, baseline used {base.get(key)!r}"
+        for key in ("students", "admins", "url", "bcrypt_log_rounds")
+        if base.get(key) != report["setup"][key]
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=8, help="concurrent students")
+    parser.add_argument("--admins", type=int, default=1, help="concurrent admins")
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--url", help="base URL of a running server; default is the in-process test client")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write the report as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 slowdown, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    from app import create_app
+    from models import db, User, Quiz
+
+    app = create_app()
+    with app.app_context():
+        usernames = db.session.execute(db.select(User.username).where(User.role == "user")).scalars().all()
+        quizzes = db.session.execute(db.select(Quiz.id, Quiz.total_qsn).where(Quiz.total_qsn > 0)).all()
+    if not usernames or not quizzes:
+        sys.exit("No users or quizzes; run benchmarks/seed.py first.")
+    questions_per_quiz = min(total for _, total in quizzes)
+    quiz_ids = [quiz_id for quiz_id, total in quizzes if total == questions_per_quiz]
+
+    def new_session():
+        return HttpSession(args.url) if args.url else TestClientSession(app)
+
+    rng = random.Random(args.seed)
+    rec = Recorder()
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=student, args=(
+            new_session(), rec, usernames[i % len(usernames)], quiz_ids, questions_per_quiz, stop,
+            random.Random(rng.random()),
+        ))
+        for i in range(args.students)
+    ] + [
+        threading.Thread(target=admin, args=(new_session(), rec, stop, random.Random(rng.random())))
+        for _ in range(args.admins)
+    ]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    report = summarize(rec, time.perf_counter() - start)
+    report["setup"] = {
+        "students": args.students, "admins": args.admins, "url": args.url or "test client",
+        "database": app.config["SQLALCHEMY_DATABASE_URI"], "python": platform.python_version(),
+        "machine": platform.machine(), "cpus": os.cpu_count(),
+        # a running server's own config is not visible from here
+        "bcrypt_log_rounds": None if args.url else app.config["BCRYPT_LOG_ROUNDS"],
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if baseline:
+        for difference in setup_differences(report, baseline):
+            print("WARNING: setup differs from the baseline:", difference)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if baseline:
+        found = regressions(report, baseline, args.tolerance)
+        for problem in found:
+            print("REGRESSION:", problem)
+        sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Seeds a synthetic database for benchmarks.
+
+Builds subjects -> chapters -> quizzes -> questions, users ``user0..userN-1``
+(password ``password``) and a random Score history, then backfills the rollup
+tables and the search index.  The data is the same for the same ``--seed``.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/seed.py --users 1000 --scores 1000000
+
+The database named by DATABASE_URL is wiped first.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import create_app  # noqa: E402
+from counters import repair_counters  # noqa: E402
+from models import db, User, Subject, Chapter, Quiz, Question, Score  # noqa: E402
+from passwords import hash_password  # noqa: E402
+from schema import init_db  # noqa: E402
+from search import rebuild_search_index  # noqa: E402
+from stats import rebuild_stats  # noqa: E402
+
+PASSWORD = "password"
+CHUNK = 50_000
+WORDS = (
+    "algebra geometry vectors matrices calculus limits series probability statistics kinetics optics "
+    "thermodynamics enzymes genetics cells grammar poetry history economics circuits networks"
+).split()
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _insert(model, rows):
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(insert(model), rows[start:start + CHUNK])
+
+
+def seed(args):
+    rng = random.Random(args.seed)
+    db.drop_all()
+    init_db()
+
+    subjects = []
+    for s in range(args.subjects):
+        subject = Subject(name=f"Subject {s} {_text(rng, 2)}", description=_text(rng, 12))
+        db.session.add(subject)
+        subjects.append(subject)
+    db.session.flush()
+
+    chapters = [
+        {"name": f"Chapter {s.id}.{c} {_text(rng, 2)}", "subject_id": s.id}
+        for s in subjects for c in range(args.chapters)
+    ]
+    _insert(Chapter, chapters)
+    chapter_ids = db.session.execute(db.select(Chapter.id)).scalars().all()
+
+    quizzes = [
+        {"name": f"Quiz {chapter_id}.{q}", "chapter_id": chapter_id, "time_duration": 30,
+         "total_qsn": args.questions}
+        for chapter_id in chapter_ids for q in range(args.quizzes)
+    ]
+    _insert(Quiz, quizzes)
+    quiz_ids = db.session.execute(db.select(Quiz.id)).scalars().all()
+
+    questions = [
+        {"quiz_id": quiz_id, "question_title": f"Q{n} {_text(rng, 3)}",
+         "question_statement": _text(rng, 15) + "?", "option1": "a", "option2": "b", "option3": "c",
+         "option4": "d", "correct_option": str(rng.randint(1, 4))}
+        for quiz_id in quiz_ids for n in range(args.questions)
+    ]
+    _insert(Question, questions)
+
+    password_hash = hash_password(PASSWORD)  # one hash shared by every user keeps seeding fast
+    users = [
+        {"username": f"user{u}", "email": f"user{u}@example.com", "qualification": "B.Sc",
+         "dob": date(2000, 1, 1), "password_hash": password_hash, "role": "user"}
+        for u in range(args.users)
+    ]
+    _insert(User, users)
+    user_ids = db.session.execute(db.select(User.id).where(User.role == "user")).scalars().all()
+    db.session.commit()
+
+    now = datetime.now(timezone.utc)
+    for start in range(0, args.scores, CHUNK):
+        rows = [
+            {"user_id": rng.choice(user_ids), "quiz_id": rng.choice(quiz_ids),
+             "total_score": rng.randint(0, args.questions),
+             "timestamp_of_attempt": now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))}
+            for _ in range(min(CHUNK, args.scores - start))
+        ]
+        db.session.execute(insert(Score), rows)
+        db.session.commit()
+
+    rebuild_stats()
+    repair_counters()
+    rebuild_search_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subjects", type=int, default=10)
+    parser.add_argument("--chapters", type=int, default=10, help="per subject")
+    parser.add_argument("--quizzes", type=int, default=5, help="per chapter")
+    parser.add_argument("--questions", type=int, default=10, help="per quiz")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--scores", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_app()
+    start = time.perf_counter()
+    with app.app_context():
+        seed(args)
+        counts = {model.__tablename__: db.session.query(model).count() for model in (Quiz, Question, User, Score)}
+    print(f"Seeded {app.config['SQLALCHEMY_DATABASE_URI']} in {time.perf_counter() - start:.1f} s: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Streaming bulk import and export of questions, and CSV export of score history.
+
+Files are CSV or JSON Lines (one JSON object per line), read and written a row
+at a time so memory stays flat whatever the file size.  Two layouts are
+supported:
+
+* questions of one quiz - the ``QUESTION_FIELDS`` columns;
+* whole catalog trees - ``TREE_FIELDS``, where every row also names its
+  subject, chapter and quiz, which are created when they don't exist yet.
+
+Valid rows are inserted with one ``executemany`` per batch, and each quiz's
+``total_qsn`` is bumped once per batch instead of being recounted per question
+(see counters.py).
+"""
+import csv
+import io
+import json
+from collections import Counter
+
+from sqlalchemy import insert, select
+
+from models import db, Subject, Chapter, Quiz, Question, Score
+import counters
+import fragments
+import quiz_cache
+import versions
+
+QUESTION_FIELDS = [
+    "question_title", "question_statement", "option1", "option2", "option3", "option4", "correct_option",
+]
+TREE_FIELDS = ["subject", "subject_description", "chapter", "quiz", "time_duration"] + QUESTION_FIELDS
+SCORE_FIELDS = ["attempted_at", "subject", "chapter", "quiz", "score", "total_questions"]
+FORMATS = ("csv", "jsonl")
+MAX_REPORTED_ERRORS = 20
+
+
+class ImportResult:
+    def __init__(self):
+        self.inserted = 0
+        self.created_quizzes = 0
+        self.error_count = 0
+        self.errors = []  # the first MAX_REPORTED_ERRORS "line N: problem" messages
+
+    def add_error(self, line_no, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {line_no}: {message}")
+
+
+def format_for(filename, default="csv"):
+    """Guesses the file format from its extension."""
+    # Plain .json is left out: a JSON array is not JSON Lines
+    if filename and filename.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    return default
+
+
+def read_rows(stream, fmt):
+    """Yields ``(line_no, row_dict)`` from a binary stream."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, e
+                continue
+            yield line_no, row if isinstance(row, dict) else ValueError("expected a JSON object")
+
+
+def clean_question(row):
+    """Validates one row's question fields. Returns (values, error)."""
+    values = {field: str(row.get(field) or "").strip() for field in QUESTION_FIELDS}
+    missing = [field for field in QUESTION_FIELDS if not values[field]]
+    if missing:
+        return None, "missing " + ", ".join(missing)
+
+    correct_option = values["correct_option"].lower().removeprefix("option")
+    if correct_option not in ("1", "2", "3", "4"):
+        return None, "correct_option must be 1-4"
+    values["correct_option"] = correct_option
+    return values, None
+
+
+class _QuizResolver:
+    """Maps (subject, chapter, quiz) names to quiz ids, creating what is missing."""
+
+    def __init__(self, result):
+        self.result = result
+        self.subjects = {}
+        self.chapters = {}
+        self.quizzes = {}
+
+    def quiz_id(self, row):
+        subject_name = str(row.get("subject") or "").strip()
+        chapter_name = str(row.get("chapter") or "").strip()
+        quiz_name = str(row.get("quiz") or "").strip()
+        if not (subject_name and chapter_name and quiz_name):
+            raise ValueError("subject, chapter and quiz are required")
+
+        key = (subject_name, chapter_name, quiz_name)
+        if key not in self.quizzes:
+            chapter_id = self._chapter_id(subject_name, chapter_name, row)
+            quiz_id = db.session.execute(
+                select(Quiz.id).where(Quiz.chapter_id == chapter_id, Quiz.name == quiz_name)
+            ).scalar()
+            if quiz_id is None:
+                try:
+                    duration = int(row.get("time_duration") or 0)
+                except ValueError:
+                    duration = 0
+                if duration <= 0:
+                    raise ValueError("time_duration must be a positive number of minutes for a new quiz")
+                quiz_id = db.session.execute(
+                    insert(Quiz).values(name=quiz_name, chapter_id=chapter_id, time_duration=duration, total_qsn=0)
+                ).inserted_primary_key[0]
+                counters.add(Chapter.quiz_count, chapter_id)
+                self.result.created_quizzes += 1
+            self.quizzes[key] = quiz_id
+        return self.quizzes[key]
+
+    def _chapter_id(self, subject_name, chapter_name, row):
+        key = (subject_name, chapter_name)
+        if key not in self.chapters:
+            subject_id = self._subject_id(subject_name, row)
+            chapter_id = db.session.execute(
+                select(Chapter.id).where(Chapter.subject_id == subject_id, Chapter.name == chapter_name)
+            ).scalar()
+            if chapter_id is None:
+                chapter_id = db.session.execute(
+                    insert(Chapter).values(name=chapter_name, subject_id=subject_id)
+                ).inserted_primary_key[0]
+                counters.add(Subject.chapter_count, subject_id)
+            self.chapters[key] = chapter_id
+        return self.chapters[key]
+
+    def _subject_id(self, subject_name, row):
+        if subject_name not in self.subjects:
+            subject_id = db.session.execute(select(Subject.id).where(Subject.name == subject_name)).scalar()
+            if subject_id is None:
+                description = str(row.get("subject_description") or "").strip() or subject_name
+                subject_id = db.session.execute(
+                    insert(Subject).values(name=subject_name, description=description)
+                ).inserted_primary_key[0]
+            self.subjects[subject_name] = subject_id
+        return self.subjects[subject_name]
+
+
+def import_questions(stream, fmt="csv", quiz_id=None, batch_size=500):
+    """Imports questions into one quiz (``quiz_id``) or, without it, whole trees.
+
+    Invalid rows are skipped and reported; every batch is its own transaction.
+    """
+    result = ImportResult()
+    resolver = _QuizResolver(result)
+    batch = []
+
+    for line_no, row in read_rows(stream, fmt):
+        if isinstance(row, Exception):
+            result.add_error(line_no, f"invalid JSON ({row})")
+            continue
+
+        values, error = clean_question(row)
+        if error:
+            result.add_error(line_no, error)
+            continue
+
+        if quiz_id is not None:
+            values["quiz_id"] = quiz_id
+        else:
+            try:
+                values["quiz_id"] = resolver.quiz_id(row)
+            except ValueError as e:
+                result.add_error(line_no, str(e))
+                continue
+
+        batch.append(values)
+        if len(batch) >= batch_size:
+            _insert_batch(batch, result)
+            batch = []
+
+    # Also commits subjects/chapters/quizzes created for rows after the last full batch
+    _insert_batch(batch, result)
+    return result
+
+
+def _insert_batch(batch, result):
+    if batch:
+        db.session.execute(insert(Question), batch)
+    per_quiz = Counter(values["quiz_id"] for values in batch)
+    for quiz_id, count in per_quiz.items():
+        counters.add(Quiz.total_qsn, quiz_id, count)
+    if per_quiz:
+        fragments.touch_quizzes(Quiz.id.in_(list(per_quiz)))
+    versions.bump(versions.CATALOG)
+    db.session.commit()
+
+    for quiz_id in per_quiz:
+        quiz_cache.invalidate(quiz_id)
+    result.inserted += len(batch)
+
+
+def export_questions(fmt="csv", quiz_id=None):
+    """Yields the export file in chunks: one quiz's questions, or every tree."""
+    question_columns = [getattr(Question, field) for field in QUESTION_FIELDS]
+    if quiz_id is not None:
+        fields = QUESTION_FIELDS
+        query = select(*question_columns).where(Question.quiz_id == quiz_id).order_by(Question.id)
+    else:
+        fields = TREE_FIELDS
+        query = (
+            select(
+                Subject.name, Subject.description, Chapter.name, Quiz.name, Quiz.time_duration,
+                *question_columns,
+            )
+            .join(Chapter, Chapter.subject_id == Subject.id)
+            .join(Quiz, Quiz.chapter_id == Chapter.id)
+            .join(Question, Question.quiz_id == Quiz.id)
+            .order_by(Subject.id, Chapter.id, Quiz.id, Question.id)
+        )
+
+    rows = db.session.execute(query.execution_options(yield_per=1000))
+
+    if fmt == "csv":
+        yield from csv_chunks(fields, rows)
+    else:
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(dict(zip(fields, row))) + "\n")
+            if len(lines) >= 500:
+                yield "".join(lines)
+                lines = []
+        yield "".join(lines)
+
+
+def export_user_scores(user_id):
+    """Yields a user's whole score history as CSV chunks, newest first."""
+    query = (
+        select(Score.timestamp_of_attempt, Subject.name, Chapter.name, Quiz.name, Score.total_score, Quiz.total_qsn)
+        .join(Quiz, Score.quiz_id == Quiz.id)
+        .join(Chapter, Quiz.chapter_id == Chapter.id)
+        .join(Subject, Chapter.subject_id == Subject.id)
+        .where(Score.user_id == user_id)
+        .order_by(Score.timestamp_of_attempt.desc(), Score.id.desc())
+    )
+    rows = db.session.execute(query.execution_options(yield_per=1000))
+    yield from csv_chunks(SCORE_FIELDS, ((ts.isoformat(), *rest) for ts, *rest in rows))
+
+
+def csv_chunks(fields, rows, chunk_size=64 * 1024):
+    """Writes a header and rows as CSV, yielding roughly ``chunk_size`` characters at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() > chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
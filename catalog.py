@@ -0,0 +1,50 @@
+"""Set-based deletes of subjects, chapters and quizzes.
+
+Each delete is a single DELETE of the parent row.  The database removes the
+rest of the subtree (chapters, quizzes, questions, attempts, answers, scores
+and their rollups) through the ``ON DELETE CASCADE`` foreign keys; on SQLite
+database.py switches foreign keys on for every connection.  The relationships
+in models.py are ``passive_deletes``, so the ORM never loads the children to
+delete them row by row.
+
+The rollups of the deleted quizzes are taken out of the user and subject
+totals first, with ``stats.forget_quizzes``, while the quizzes still exist,
+and the parent's child counter goes down by one (see counters.py).
+"""
+from sqlalchemy import delete, select
+
+from models import db, Subject, Chapter, Quiz
+import counters
+import stats
+
+
+def _delete(model, model_id, quiz_ids, counter=None, parent_id=None):
+    stats.forget_quizzes(quiz_ids)
+    if counter is not None:
+        counters.add(counter, parent_id, -1)
+    result = db.session.execute(
+        delete(model).where(model.id == model_id).execution_options(synchronize_session=False)
+    )
+    # Loaded objects of the subtree are now stale
+    db.session.expire_all()
+    return result.rowcount > 0
+
+
+def delete_subject(subject_id):
+    """Deletes a subject and everything under it. Returns False if it doesn't exist."""
+    quiz_ids = select(Quiz.id).join(Chapter, Quiz.chapter_id == Chapter.id).where(Chapter.subject_id == subject_id)
+    return _delete(Subject, subject_id, quiz_ids)
+
+
+def delete_chapter(chapter_id):
+    """Deletes a chapter and its quizzes. Returns False if it doesn't exist."""
+    subject_id = db.session.execute(select(Chapter.subject_id).where(Chapter.id == chapter_id)).scalar()
+    return _delete(
+        Chapter, chapter_id, select(Quiz.id).where(Quiz.chapter_id == chapter_id), Subject.chapter_count, subject_id
+    )
+
+
+def delete_quiz(quiz_id):
+    """Deletes a quiz with its questions, attempts and scores. Returns False if it doesn't exist."""
+    chapter_id = db.session.execute(select(Quiz.chapter_id).where(Quiz.id == quiz_id)).scalar()
+    return _delete(Quiz, quiz_id, [quiz_id], Chapter.quiz_count, chapter_id)
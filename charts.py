@@ -0,0 +1,269 @@
+"""Matplotlib summary charts, rendered once per data version and cached as PNG bytes.
+
+Matplotlib is only imported when the first chart is drawn.
+
+A chart's cache key includes the version token of the data it is drawn from
+(see ``versions.py``), so a new score or a catalog change makes the next
+request render a fresh image instead of serving a stale one.
+"""
+import io
+import threading
+from datetime import datetime
+
+from flask import current_app
+
+from cache import LRUCache
+from analytics import time_bucket
+from models import db, Subject, Chapter, Quiz, Score, QuizStat, SubjectStat, UserQuizStat
+import versions
+
+USER_CHARTS = ("subjects", "scores", "extremes")
+ADMIN_CHARTS = ("attempts", "subjects", "extremes")
+MAX_TIME_POINTS = 90  # upper bound on the points of a score-over-time chart
+
+_cache = None
+_render_lock = threading.Lock()  # pyplot keeps global state, so draw one chart at a time
+plt = None  # matplotlib.pyplot, imported on the first render (it is slow to import)
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(maxsize=current_app.config["CHART_CACHE_SIZE"])
+    return _cache
+
+
+def user_version(user_id):
+    return versions.version_token(versions.CATALOG, versions.user_key(user_id))
+
+
+def admin_version():
+    return versions.version_token(versions.CATALOG, versions.SCORES)
+
+
+def user_chart_png(name, user_id, version):
+    """PNG bytes of one of the user's summary charts at ``version``."""
+    render = {
+        "subjects": _user_subjects_chart,
+        "scores": _user_scores_chart,
+        "extremes": _user_extremes_chart,
+    }[name]
+    return get_cache().get_or_create(("user", user_id, name, version), lambda: _render(render, user_id))
+
+
+def admin_chart_png(name, version):
+    """PNG bytes of one of the admin summary charts at ``version``."""
+    render = {
+        "attempts": _admin_attempts_chart,
+        "subjects": _admin_subjects_chart,
+        "extremes": _admin_extremes_chart,
+    }[name]
+    return get_cache().get_or_create(("admin", name, version), lambda: _render(render))
+
+
+def _render(render, *args):
+    with _render_lock:
+        _load_pyplot()
+        return render(*args)
+
+
+def _load_pyplot():
+    global plt
+    if plt is None:
+        import matplotlib
+        matplotlib.use('Agg')  # Use non-GUI backend for Matplotlib
+        import matplotlib.pyplot
+        plt = matplotlib.pyplot
+
+
+def _to_png(fig, **kwargs):
+    img = io.BytesIO()
+    fig.savefig(img, format='png', **kwargs)
+    plt.close(fig)
+    return img.getvalue()
+
+
+def _no_data(ax):
+    ax.text(0.5, 0.5, "No Data Available", ha='center', va='center', fontsize=12)
+
+
+# user charts.......................
+
+
+def _user_subjects_chart(user_id):
+    subject_data = (
+        db.session.query(Subject.name, db.func.sum(UserQuizStat.attempt_count))
+        .join(Chapter, Subject.id == Chapter.subject_id)
+        .join(Quiz, Chapter.id == Quiz.chapter_id)
+        .join(UserQuizStat, Quiz.id == UserQuizStat.quiz_id)
+        .filter(UserQuizStat.user_id == user_id)
+        .group_by(Subject.id, Subject.name)
+        .all()
+    )
+
+    subject_labels, subject_counts = zip(*subject_data) if subject_data else ([], [])
+    fig, ax = plt.subplots(figsize=(6, 5))
+    if subject_labels:
+        ax.pie(subject_counts, labels=subject_labels, autopct='%1.1f%%', colors=['#ff9999','#66b3ff','#99ff99','#ffcc99'])
+        ax.set_title("Quiz Attempts Per Subject")
+    else:
+        _no_data(ax)
+    return _to_png(fig, bbox_inches='tight')
+
+
+def score_resolution(first, last):
+    """The finest of day/week/month that keeps a date range within MAX_TIME_POINTS buckets."""
+    days = (last - first).days + 1
+    if days <= MAX_TIME_POINTS:
+        return "day"
+    if days <= MAX_TIME_POINTS * 7:
+        return "week"
+    return "month"
+
+
+def user_score_series(user_id):
+    """The user's scores averaged per day, week or month in SQL.
+
+    Returns ``(unit, [(bucket_start, avg, min, max, count)])``; at most about
+    MAX_TIME_POINTS rows however long the history is.
+    """
+    first, last = (
+        db.session.query(db.func.min(Score.timestamp_of_attempt), db.func.max(Score.timestamp_of_attempt))
+        .filter(Score.user_id == user_id)
+        .one()
+    )
+    if first is None:
+        return "day", []
+
+    unit = score_resolution(first, last)
+    bucket = time_bucket(Score.timestamp_of_attempt, unit)
+    score = db.func.coalesce(Score.total_score, 0)
+    rows = (
+        db.session.query(bucket, db.func.avg(score), db.func.min(score), db.func.max(score), db.func.count())
+        .filter(Score.user_id == user_id)
+        .group_by(bucket)
+        .order_by(bucket)
+        .all()
+    )
+    # SQLite returns the bucket as text
+    return unit, [
+        (datetime.fromisoformat(start) if isinstance(start, str) else start, avg, low, high, count)
+        for start, avg, low, high, count in rows
+    ]
+
+
+def _user_scores_chart(user_id):
+    unit, series = user_score_series(user_id)
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    if series:
+        starts, averages, lows, highs, _ = zip(*series)
+        if len(series) > 1:
+            ax.fill_between(starts, lows, highs, color='#66b3ff', alpha=0.2, label="Lowest to highest")
+        ax.plot(starts, averages, marker='o' if len(series) <= 40 else None, linestyle='-', color='#66b3ff',
+                label=f"Average per {unit}")
+        ax.set_xlabel("Date")
+        ax.set_ylabel("Score")
+        ax.set_title("Quiz Scores Over Time")
+        ax.legend()
+    else:
+        _no_data(ax)
+    return _to_png(fig, bbox_inches='tight')
+
+
+def _user_extremes_chart(user_id):
+    score_extremes = (
+        db.session.query(Quiz.name, UserQuizStat.max_score, UserQuizStat.min_score)
+        .join(UserQuizStat, Quiz.id == UserQuizStat.quiz_id)
+        .filter(UserQuizStat.user_id == user_id)
+        .order_by(Quiz.id)
+        .all()
+    )
+
+    quiz_labels, high_scores, low_scores = zip(*score_extremes) if score_extremes else ([], [], [])
+    fig, ax = plt.subplots(figsize=(6, 4))
+    if quiz_labels:
+        x = range(len(quiz_labels))
+        ax.bar(x, high_scores, color='green', alpha=0.6, label="High Scores")
+        ax.bar(x, low_scores, color='red', alpha=0.6, label="Low Scores")
+        ax.set_xticks(x)
+        ax.set_xticklabels(quiz_labels, rotation=45, ha='right')
+        ax.set_ylabel("Scores")
+        ax.set_title("Highest & Lowest Scores Per Quiz")
+        ax.legend()
+    else:
+        _no_data(ax)
+    return _to_png(fig, bbox_inches='tight')
+
+
+# admin charts.......................
+
+
+def _admin_attempts_chart():
+    # Most attempted quizzes
+    quiz_attempts = (
+        db.session.query(Quiz.name, QuizStat.attempt_count)
+        .join(QuizStat, Quiz.id == QuizStat.quiz_id)
+        .filter(QuizStat.attempt_count > 0)
+        .order_by(QuizStat.attempt_count.desc())
+        .limit(5)
+        .all()
+    )
+
+    fig = plt.figure(figsize=(7, 7))
+    if quiz_attempts:
+        plt.bar([q[0] for q in quiz_attempts], [q[1] for q in quiz_attempts], color='blue')
+        plt.xlabel("Quiz Name")
+        plt.ylabel("Attempts")
+        plt.xticks(rotation=30)
+    else:
+        _no_data(plt.gca())
+    plt.title("Most Attempted Quizzes")
+    return _to_png(fig)
+
+
+def _admin_subjects_chart():
+    # Subject-wise quiz attempts
+    subject_attempts = (
+        db.session.query(Subject.name, SubjectStat.attempt_count)
+        .join(SubjectStat, Subject.id == SubjectStat.subject_id)
+        .filter(SubjectStat.attempt_count > 0)
+        .order_by(Subject.id)
+        .all()
+    )
+
+    fig = plt.figure(figsize=(7, 7))
+    if subject_attempts:
+        plt.pie([s[1] for s in subject_attempts], labels=[s[0] for s in subject_attempts], autopct='%1.1f%%', colors=['red', 'blue', 'green', 'orange', 'purple'])
+    else:
+        # plt.pie raises on an empty list
+        _no_data(plt.gca())
+    plt.title("Quiz Attempts Per Subject")
+    return _to_png(fig)
+
+
+def _admin_extremes_chart():
+    # Highest & Lowest Scores Per Quiz
+    score_extremes = (
+        db.session.query(Quiz.name, QuizStat.max_score, QuizStat.min_score)
+        .join(QuizStat, Quiz.id == QuizStat.quiz_id)
+        .filter(QuizStat.attempt_count > 0)
+        .order_by(Quiz.id)
+        .all()
+    )
+
+    fig = plt.figure(figsize=(6, 6))
+    if score_extremes:
+        quizzes = [s[0] for s in score_extremes]
+        high_scores = [s[1] for s in score_extremes]
+        low_scores = [s[2] for s in score_extremes]
+        plt.bar(quizzes, high_scores, color='green', label="Highest Score")
+        plt.bar(quizzes, low_scores, color='red', label="Lowest Score")
+        plt.xlabel("Quiz Name")
+        plt.ylabel("Scores")
+        plt.legend()
+        plt.xticks(rotation=30)
+    else:
+        _no_data(plt.gca())
+    plt.title("Highest & Lowest Scores Per Quiz")
+    return _to_png(fig)
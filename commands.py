@@ -0,0 +1,99 @@
+"""Flask CLI commands (run with ``flask --app app <command>``)."""
+import click
+
+import bulk_io
+from counters import repair_counters, verify_counters
+from schema import init_db, upgrade_schema, check_query_plans
+from search import rebuild_search_index
+from stats import rebuild_stats, verify_stats
+
+
+def register_commands(app):
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Create the tables, indexes and search index, and the Admin user."""
+        if init_db():
+            click.echo("Admin user created.")
+        click.echo("Database setup complete!")
+
+    @app.cli.command("upgrade-db")
+    def upgrade_db_command():
+        """Add the columns and indexes an existing database is missing."""
+        created = upgrade_schema()
+        click.echo(f"Created: {', '.join(created)}" if created else "Database is up to date.")
+
+    @app.cli.command("check-indexes")
+    def check_indexes_command():
+        """Fail if a hot query does a full table scan (EXPLAIN QUERY PLAN)."""
+        failed = False
+        for description, plan, ok in check_query_plans():
+            click.echo(f"{'ok  ' if ok else 'SCAN'} {description}: {'; '.join(plan)}")
+            failed = failed or not ok
+        if failed:
+            raise SystemExit(1)
+
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index_command():
+        """Rebuild the full-text search index from the database."""
+        count = rebuild_search_index()
+        click.echo(f"Search index rebuilt ({count} entries).")
+
+    @app.cli.command("rebuild-stats")
+    def rebuild_stats_command():
+        """Backfill the score rollup tables from the Score history."""
+        rebuild_stats()
+        click.echo("Score rollups rebuilt.")
+
+    @app.cli.command("verify-stats")
+    @click.option("--repair", is_flag=True, help="Rebuild the rollups if they have drifted.")
+    def verify_stats_command(repair):
+        """Check the score rollup tables against the Score history."""
+        problems = verify_stats()
+        for problem in problems:
+            click.echo(problem)
+        if not problems:
+            click.echo("Score rollups are consistent.")
+        elif repair:
+            rebuild_stats()
+            click.echo(f"Repaired {len(problems)} mismatches.")
+        else:
+            raise SystemExit(1)
+
+    @app.cli.command("check-counters")
+    @click.option("--repair", is_flag=True, help="Recount the counters that have drifted.")
+    def check_counters_command(repair):
+        """Check the question, quiz and chapter counters against the child tables."""
+        problems = verify_counters()
+        for problem in problems:
+            click.echo(problem)
+        if not problems:
+            click.echo("Counters are consistent.")
+        elif repair:
+            repair_counters()
+            click.echo(f"Repaired {len(problems)} counters.")
+        else:
+            raise SystemExit(1)
+
+    @app.cli.command("import-questions")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--quiz-id", type=int, help="Import into this quiz instead of reading subject/chapter/quiz columns.")
+    @click.option("--batch-size", type=int, default=500, show_default=True)
+    def import_questions_command(path, quiz_id, batch_size):
+        """Import questions from a CSV or JSON Lines file."""
+        with open(path, "rb") as stream:
+            result = bulk_io.import_questions(stream, bulk_io.format_for(path), quiz_id=quiz_id, batch_size=batch_size)
+        click.echo(f"Imported {result.inserted} questions ({result.created_quizzes} new quizzes).")
+        for error in result.errors:
+            click.echo(error)
+        if result.error_count > len(result.errors):
+            click.echo(f"... and {result.error_count - len(result.errors)} more invalid rows.")
+
+    @app.cli.command("export-questions")
+    @click.argument("path", type=click.Path(dir_okay=False, writable=True))
+    @click.option("--quiz-id", type=int, help="Export only this quiz's questions.")
+    def export_questions_command(path, quiz_id):
+        """Export questions to a CSV or JSON Lines file."""
+        with open(path, "w", encoding="utf-8", newline="") as out:
+            for chunk in bulk_io.export_questions(bulk_io.format_for(path), quiz_id):
+                out.write(chunk)
+        click.echo(f"Exported to {path}.")
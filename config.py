@@ -2,7 +2,85 @@ import os
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def env_flag(name, default=False):
+    value = os.environ.get(name)
+    return default if value is None else value.lower() in ("1", "true", "yes", "on")
+
+
+def database_uri():
+    """DATABASE_URL if set (SQLite or PostgreSQL), else the local SQLite file."""
+    uri = os.environ.get("DATABASE_URL", "sqlite:///" + os.path.join(BASE_DIR, "quiz_master.db"))
+    if uri.startswith("postgres://"):  # old-style scheme some hosts still hand out
+        uri = "postgresql://" + uri[len("postgres://"):]
+    return uri
+
+
+def engine_options(uri):
+    """Connection pool settings for SQLALCHEMY_ENGINE_OPTIONS."""
+    if uri.startswith("sqlite"):
+        if ":memory:" in uri or uri in ("sqlite://", "sqlite:///"):
+            return {}  # in-memory databases use a single shared connection
+        return {
+            "pool_size": env_int("DB_POOL_SIZE", 10),
+            "max_overflow": env_int("DB_MAX_OVERFLOW", 20),
+            "pool_timeout": env_int("DB_POOL_TIMEOUT", 30),
+            # Python's own lock wait; the busy_timeout pragma below does the same inside SQLite
+            "connect_args": {"timeout": env_int("SQLITE_BUSY_TIMEOUT_MS", 5000) / 1000},
+        }
+    return {
+        "pool_size": env_int("DB_POOL_SIZE", 10),
+        "max_overflow": env_int("DB_MAX_OVERFLOW", 20),
+        "pool_timeout": env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": True,
+    }
+
+
 class Config:
     SECRET_KEY = "your_secret_key" 
-    SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(BASE_DIR, "quiz_master.db")  
+    SQLALCHEMY_DATABASE_URI = database_uri()
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False 
+
+    # SQLite pragmas applied to every new connection (see database.py)
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")  # readers don't block the writer
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")  # safe with WAL, far fewer fsyncs
+    SQLITE_BUSY_TIMEOUT_MS = env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)  # wait for the write lock instead of failing
+    SQLITE_MMAP_SIZE = env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+    SQLITE_CACHE_SIZE = env_int("SQLITE_CACHE_SIZE", -64000)  # negative = KiB, so 64 MB per connection
+
+    QUIZ_PAGE_SIZE = 20  # quizzes per page on the quiz management console
+    SEARCH_PAGE_SIZE = 25  # ranked search hits per page
+    SCORE_PAGE_SIZE = 25  # attempts per page of a user's score history
+    LEADERBOARD_SIZE = 10  # players shown on a quiz leaderboard
+    CHART_CACHE_SIZE = 256  # rendered summary charts kept in memory
+    ANALYTICS_CACHE_SIZE = 256  # computed summary analytics kept in memory
+    ANALYTICS_ADMIN_TTL = 300  # seconds new scores may take to show in the admin analytics
+    FRAGMENT_CACHE_SIZE = 4096  # rendered per-quiz template fragments kept in memory
+    FRAGMENT_CACHE_URL = os.environ.get("FRAGMENT_CACHE_URL")  # e.g. redis://localhost:6379/0 to share fragments between workers
+    FRAGMENT_CACHE_TTL = 24 * 3600  # seconds a fragment lives in the shared cache
+    QUIZ_CACHE_SIZE = 256  # quizzes whose questions are kept in memory for quiz takers
+    QUIZ_CACHE_TTL = 300  # seconds; bounds staleness when another worker edits a quiz
+    ATTEMPT_CACHE_SIZE = 4096  # in-progress attempts whose question order is kept in memory
+    PRINCIPAL_CACHE_SIZE = 4096  # logged-in users whose id/name/role are kept in memory
+    PRINCIPAL_CACHE_TTL = 60  # seconds; bounds staleness when another worker changes a user
+    VERSION_STAMP_TTL = 2  # seconds a data version is trusted before a conditional GET re-reads it
+    BCRYPT_LOG_ROUNDS = env_int("BCRYPT_LOG_ROUNDS", 12)  # changing it re-hashes passwords on next login
+    BCRYPT_MAX_CONCURRENCY = env_int("BCRYPT_MAX_CONCURRENCY", os.cpu_count() or 2)  # password worker threads
+    BCRYPT_QUEUE_TIMEOUT = env_int("BCRYPT_QUEUE_TIMEOUT", 10)  # seconds a login waits for a free worker
+    SLOW_REQUEST_MS = env_int("SLOW_REQUEST_MS", 0)  # log requests slower than this (0 = off)
+    SLOW_REQUEST_LOG_STATEMENTS = 10  # slowest SQL statements included in each slow-request log entry
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")  # if set, /metrics requires "Authorization: Bearer <token>"
+    ANSWER_FLUSH_SIZE = 10  # answers buffered in the session before they are written
+    SUBMIT_GRACE_SECONDS = 10  # answers are still accepted this long after the timer ends
+    SCORE_WRITE_BEHIND = env_flag("SCORE_WRITE_BEHIND")  # batch quiz submissions in a background thread
+    SCORE_BATCH_INTERVAL_MS = env_int("SCORE_BATCH_INTERVAL_MS", 20)  # how long a batch collects submissions
+    SCORE_BATCH_MAX = 500  # submissions per transaction
+    SCORE_DEAD_LETTER_FILE = os.environ.get(  # queued submissions that could not be written, one JSON per line
+        "SCORE_DEAD_LETTER_FILE", os.path.join(BASE_DIR, "failed_submissions.jsonl")
+    )
@@ -0,0 +1,53 @@
+"""Denormalized child counts on the catalog rows.
+
+``Quiz.total_qsn``, ``Chapter.quiz_count`` and ``Subject.chapter_count`` are
+kept current with atomic ``UPDATE ... SET n = n + k`` statements in the
+caller's transaction, so adding or deleting a row never loads or recounts its
+siblings, and pages read the counts straight off the parent row.  Attempt
+counts per quiz live in the ``QuizStat`` rollup (see stats.py).
+
+``verify_counters`` / ``repair_counters`` recount from the child tables.
+"""
+from sqlalchemy import func, select, update
+
+from models import db, Subject, Chapter, Quiz, Question
+
+# counter column -> the child table's foreign key it counts rows of
+COUNTERS = (
+    (Quiz.total_qsn, Question.quiz_id),
+    (Chapter.quiz_count, Quiz.chapter_id),
+    (Subject.chapter_count, Chapter.subject_id),
+)
+
+
+def add(counter, parent_id, delta=1):
+    """Adds ``delta`` to a counter column of one parent row, e.g. ``add(Quiz.total_qsn, quiz_id)``."""
+    model = counter.class_
+    db.session.execute(update(model).where(model.id == parent_id).values({counter.key: counter + delta}))
+
+
+def _recount(counter, foreign_key):
+    model = counter.class_
+    return select(func.count()).where(foreign_key == model.id).scalar_subquery()
+
+
+def verify_counters():
+    """Compares every counter with a recount. Returns a list of mismatch descriptions."""
+    problems = []
+    for counter, foreign_key in COUNTERS:
+        model = counter.class_
+        actual = _recount(counter, foreign_key)
+        rows = db.session.execute(select(model.id, counter, actual).where(counter != actual)).all()
+        for parent_id, stored, expected in rows:
+            problems.append(f"{model.__tablename__} {parent_id}: {counter.key} is {stored}, expected {expected}")
+    return problems
+
+
+def repair_counters():
+    """Recounts every counter in one transaction."""
+    for counter, foreign_key in COUNTERS:
+        db.session.execute(
+            update(counter.class_).values({counter.key: _recount(counter, foreign_key)})
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
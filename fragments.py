@@ -0,0 +1,119 @@
+"""Cached template fragments for the per-quiz blocks of the catalog pages.
+
+The dashboards render a modal (or a card and several modals) for every quiz,
+and that HTML is the same for every viewer until the quiz changes.  Templates
+wrap such blocks in::
+
+    {% cache "quiz_modal", quiz.cache_key %} ... {% endcache %}
+
+and the rendered HTML is kept per key in a bounded in-process LRU cache, and
+in a shared Redis cache as well when ``FRAGMENT_CACHE_URL`` is set, so other
+workers reuse it.  The key also holds the template name and a checksum of the
+template source, so an edited template never serves its old fragments.
+
+``Quiz.cache_key`` changes whenever the quiz is edited: routes that change a
+quiz, its questions, or the chapter or subject names shown with it call
+``touch_quizzes`` in the same transaction.
+"""
+import logging
+import zlib
+
+from flask import current_app
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import update
+
+from cache import LRUCache
+from models import db, Quiz
+
+logger = logging.getLogger("quiz_master.fragments")
+
+_cache = None
+_shared = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(maxsize=current_app.config["FRAGMENT_CACHE_SIZE"])
+    return _cache
+
+
+class RedisStore:
+    """Fragments shared between workers through Redis; errors count as misses."""
+
+    def __init__(self, url, ttl):
+        import redis  # only needed when FRAGMENT_CACHE_URL is set
+        self.errors = (redis.RedisError,)
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        try:
+            value = self.client.get(key)
+        except self.errors:
+            logger.warning("fragment cache read failed", exc_info=True)
+            return None
+        return value.decode() if value is not None else None
+
+    def set(self, key, html):
+        try:
+            self.client.set(key, html.encode(), ex=self.ttl)
+        except self.errors:
+            logger.warning("fragment cache write failed", exc_info=True)
+
+
+def get_shared():
+    """The shared store, or None without ``FRAGMENT_CACHE_URL``."""
+    global _shared
+    url = current_app.config["FRAGMENT_CACHE_URL"]
+    if url and _shared is None:
+        _shared = RedisStore(url, current_app.config["FRAGMENT_CACHE_TTL"])
+    return _shared
+
+
+def touch_quizzes(*criteria):
+    """Moves the matching quizzes to a new version, e.g. ``touch_quizzes(Quiz.chapter_id == chapter_id)``."""
+    db.session.execute(
+        update(Quiz).where(*criteria).values(version=Quiz.version + 1).execution_options(synchronize_session=False)
+    )
+
+
+class FragmentCacheExtension(Extension):
+    """The ``{% cache key, ... %}`` tag."""
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+
+        checksum = 0
+        if parser.name and self.environment.loader:
+            source = self.environment.loader.get_source(self.environment, parser.name)[0]
+            checksum = zlib.crc32(source.encode())
+        prefix = nodes.Const(f"fragment:{parser.name}:{checksum:08x}")
+        call = self.call_method("_render", [prefix, nodes.List(parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, prefix, parts, caller):
+        key = ":".join([prefix] + [str(part) for part in parts])
+        cache = get_cache()
+        html = cache.get(key)
+        if html is None:
+            shared = get_shared()
+            html = shared.get(key) if shared else None
+            if html is None:
+                html = str(caller())
+                if shared:
+                    shared.set(key, html)
+            cache.set(key, html)
+        return Markup(html)
+
+
+def init_fragment_cache(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
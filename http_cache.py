@@ -0,0 +1,88 @@
+"""Conditional GETs for pages that only change with the catalog.
+
+The dashboards and the quiz console re-rendered the whole catalog on every
+view.  Views wrapped in ``conditional(versions.CATALOG)`` now send a weak
+``ETag`` built from the data versions and the viewer, plus ``Last-Modified``
+from the versions' change time, and answer a matching ``If-None-Match`` (or,
+without one, ``If-Modified-Since``) with ``304 Not Modified`` before the view
+runs - no query and no template work when the version stamp and the login
+principal are cached.
+
+The ETag also holds a checksum of the template sources, so every worker
+agrees on it across restarts, while a release with changed templates never
+revalidates pages rendered from the old ones.
+
+The pages greet the logged-in user, so responses are ``private`` with
+``Vary: Cookie``: shared caches don't store them and the ETag names the user.
+A page rendered while flash messages are pending is sent with ``no-store``
+and no validators, so a one-off message is neither swallowed by a 304 nor
+replayed from a cached copy.
+"""
+import hashlib
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+
+import versions
+
+_release = None
+
+
+def _templates_checksum():
+    """Checksum of every template source, computed once per process."""
+    global _release
+    if _release is None:
+        env = current_app.jinja_env
+        digest = hashlib.sha1()
+        for name in sorted(env.list_templates()):
+            digest.update(name.encode())
+            digest.update(env.loader.get_source(env, name)[0].encode())
+        _release = digest.hexdigest()[:12]
+    return _release
+
+
+def _etag(stamps):
+    user = current_user if current_user.is_authenticated else None
+    parts = [_templates_checksum(), request.full_path, user and user.get_id(), user and user.username, user and user.is_admin]
+    parts += [version for version, _ in stamps]
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+
+def _is_fresh(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional(*keys):
+    """Serves the view with validators for the versions ``keys`` and 304s unchanged pages."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if session.get("_flashes"):
+                response = make_response(view(*args, **kwargs))
+                response.headers["Cache-Control"] = "private, no-store"
+                return response
+
+            stamps = [versions.stamp(key) for key in keys]
+            etag = _etag(stamps)
+            changed = [updated_at for _, updated_at in stamps if updated_at]
+            last_modified = max(changed) if changed else None
+
+            if _is_fresh(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            response.headers["Cache-Control"] = "private, no-cache"
+            response.vary.add("Cookie")
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,212 @@
+"""Per-request timing and SQL instrumentation, served in Prometheus format at ``/metrics``.
+
+For every request we record the endpoint, wall time, number of SQL statements,
+time spent in SQL and time spent rendering templates.  SQL is counted with
+SQLAlchemy cursor events, templates with Flask's template signals.
+
+Requests slower than ``SLOW_REQUEST_MS`` are logged to the
+``quiz_master.slow_requests`` logger with their slowest statements.
+
+Metrics are kept per process; with several workers, scrape each one (or sum
+them in Prometheus).  Set ``METRICS_TOKEN`` to require
+``Authorization: Bearer <token>`` on ``/metrics``.
+"""
+import logging
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request, abort
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+
+from models import db
+import analytics
+import attempts
+import charts
+import fragments
+import principals
+import quiz_cache
+
+logger = logging.getLogger("quiz_master.slow_requests")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label value, in the Prometheus layout."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {}  # label -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, label, value):
+        series = self.series.setdefault(label, [0] * (len(self.buckets) + 2))
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                series[i] += 1
+        series[-2] += 1
+        series[-1] += value
+
+    def lines(self, name, label_name):
+        for label, series in sorted(self.series.items()):
+            for upper, count in zip(self.buckets, series):
+                yield f'{name}_bucket{{{label_name}="{label}",le="{upper}"}} {count}'
+            yield f'{name}_bucket{{{label_name}="{label}",le="+Inf"}} {series[-2]}'
+            yield f'{name}_sum{{{label_name}="{label}"}} {series[-1]:.6f}'
+            yield f'{name}_count{{{label_name}="{label}"}} {series[-2]}'
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}  # (endpoint, method, status) -> count
+        self.sql_seconds = {}  # endpoint -> total
+        self.template_seconds = {}  # endpoint -> total
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.sql_statements = Histogram(QUERY_COUNT_BUCKETS)
+
+    def record(self, endpoint, method, status, seconds, sql_count, sql_seconds, template_seconds):
+        with self.lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.sql_seconds[endpoint] = self.sql_seconds.get(endpoint, 0.0) + sql_seconds
+            self.template_seconds[endpoint] = self.template_seconds.get(endpoint, 0.0) + template_seconds
+            self.duration.observe(endpoint, seconds)
+            self.sql_statements.observe(endpoint, sql_count)
+
+    def render(self, cache_stats):
+        with self.lock:
+            lines = [
+                "# HELP quiz_http_requests_total Requests served, by endpoint, method and status.",
+                "# TYPE quiz_http_requests_total counter",
+            ]
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(
+                    f'quiz_http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}'
+                )
+            lines += [
+                "# HELP quiz_http_request_duration_seconds Wall time per request.",
+                "# TYPE quiz_http_request_duration_seconds histogram",
+                *self.duration.lines("quiz_http_request_duration_seconds", "endpoint"),
+                "# HELP quiz_sql_statements_per_request SQL statements issued per request.",
+                "# TYPE quiz_sql_statements_per_request histogram",
+                *self.sql_statements.lines("quiz_sql_statements_per_request", "endpoint"),
+                "# HELP quiz_sql_seconds_total Time spent executing SQL.",
+                "# TYPE quiz_sql_seconds_total counter",
+            ]
+            lines += [f'quiz_sql_seconds_total{{endpoint="{e}"}} {s:.6f}' for e, s in sorted(self.sql_seconds.items())]
+            lines += [
+                "# HELP quiz_template_seconds_total Time spent rendering templates.",
+                "# TYPE quiz_template_seconds_total counter",
+            ]
+            lines += [
+                f'quiz_template_seconds_total{{endpoint="{e}"}} {s:.6f}' for e, s in sorted(self.template_seconds.items())
+            ]
+
+        for stat, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("size", "gauge")):
+            name = f"quiz_cache_{stat}" + ("_total" if kind == "counter" else "")
+            lines += [f"# HELP {name} In-process cache {stat}.", f"# TYPE {name} {kind}"]
+            lines += [f'{name}{{cache="{cache}"}} {stats[stat]}' for cache, stats in sorted(cache_stats.items())]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def init_instrumentation(app):
+    """Hooks the app's engine, requests and templates, and adds ``/metrics``."""
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
+
+
+# hooks.......................
+
+
+def _start_request():
+    g.instrumentation = {
+        "start": time.perf_counter(),
+        "sql_count": 0,
+        "sql_seconds": 0.0,
+        "statements": [],  # (seconds, statement) for the slow-request log
+        "template_seconds": 0.0,
+        "template_starts": [],
+    }
+
+
+def _finish_request(response):
+    data = g.pop("instrumentation", None)
+    if data is None:
+        return response
+    seconds = time.perf_counter() - data["start"]
+    endpoint = request.endpoint or "unmatched"
+    metrics.record(
+        endpoint, request.method, response.status_code, seconds,
+        data["sql_count"], data["sql_seconds"], data["template_seconds"],
+    )
+
+    slow_ms = current_app.config["SLOW_REQUEST_MS"]
+    if slow_ms and seconds * 1000 >= slow_ms:
+        slowest = sorted(data["statements"], reverse=True)[:current_app.config["SLOW_REQUEST_LOG_STATEMENTS"]]
+        logger.warning(
+            "slow request %s %s (%s): %.0f ms, %d SQL statements in %.0f ms, templates %.0f ms%s",
+            request.method, request.path, endpoint, seconds * 1000, data["sql_count"],
+            data["sql_seconds"] * 1000, data["template_seconds"] * 1000,
+            "".join(f"\n  {s * 1000:.1f} ms: {statement}" for s, statement in slowest),
+        )
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start"].pop()
+    if not has_request_context():
+        return
+    data = g.get("instrumentation")
+    if data is None:
+        return
+    data["sql_count"] += 1
+    data["sql_seconds"] += seconds
+    if current_app.config["SLOW_REQUEST_MS"]:
+        data["statements"].append((seconds, " ".join(statement.split())))
+
+
+def _before_render(sender, template, context, **extra):
+    data = g.get("instrumentation")
+    if data is not None:
+        data["template_starts"].append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    data = g.get("instrumentation")
+    if data is not None and data["template_starts"]:
+        data["template_seconds"] += time.perf_counter() - data["template_starts"].pop()
+
+
+# endpoint.......................
+
+
+def metrics_view():
+    token = current_app.config["METRICS_TOKEN"]
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        abort(401)
+
+    cache_stats = {
+        "principals": principals.get_cache().stats(),
+        "quizzes": quiz_cache.get_cache().stats(),
+        "attempts": attempts.get_cache().stats(),
+        "charts": charts.get_cache().stats(),
+        "analytics": analytics.get_cache().stats(),
+        "fragments": fragments.get_cache().stats(),
+    }
+    return metrics.render(cache_stats), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
@@ -0,0 +1,63 @@
+"""Per-quiz leaderboards from the rollup tables.
+
+Users are ranked by their best score on a quiz.  The top of the board is read
+from ``UserQuizStat`` through its ``(quiz_id, max_score)`` index, and a user's
+rank and percentile come from ``QuizScoreBucket`` - one row per distinct best
+score, at most the quiz's question count plus one - so neither needs to sort
+the quiz's Score history.  Both tables are kept current by
+``stats.record_score``.
+"""
+from collections import namedtuple
+
+from sqlalchemy import case, func, select
+
+from models import db, User, UserQuizStat, QuizScoreBucket
+
+Entry = namedtuple("Entry", "rank username best_score attempt_count")
+# rank 1 is best; ties share a rank. percentile: share of players with a lower best score
+Standing = namedtuple("Standing", "best_score rank players percentile")
+
+
+def top(quiz_id, limit=10):
+    """The quiz's best players as a list of ``Entry``."""
+    rows = db.session.execute(
+        select(User.username, UserQuizStat.max_score, UserQuizStat.attempt_count)
+        .join(User, User.id == UserQuizStat.user_id)
+        .where(UserQuizStat.quiz_id == quiz_id)
+        .order_by(UserQuizStat.max_score.desc(), UserQuizStat.user_id)
+        .limit(limit)
+    ).all()
+
+    entries = []
+    for position, (username, best_score, attempt_count) in enumerate(rows, start=1):
+        rank = entries[-1].rank if entries and entries[-1].best_score == best_score else position
+        entries.append(Entry(rank, username, best_score, attempt_count))
+    return entries
+
+
+def standings(user_id, quiz_ids):
+    """``{quiz_id: Standing}`` for the quizzes among ``quiz_ids`` the user has taken, in one query."""
+    if not quiz_ids:
+        return {}
+    count = QuizScoreBucket.user_count
+    rows = db.session.execute(
+        select(
+            UserQuizStat.quiz_id,
+            UserQuizStat.max_score,
+            func.sum(case((QuizScoreBucket.score > UserQuizStat.max_score, count), else_=0)),
+            func.sum(case((QuizScoreBucket.score < UserQuizStat.max_score, count), else_=0)),
+            func.sum(count),
+        )
+        .join(QuizScoreBucket, QuizScoreBucket.quiz_id == UserQuizStat.quiz_id)
+        .where(UserQuizStat.user_id == user_id, UserQuizStat.quiz_id.in_(quiz_ids))
+        .group_by(UserQuizStat.quiz_id, UserQuizStat.max_score)
+    ).all()
+    return {
+        quiz_id: Standing(best_score, above + 1, players, round(100 * below / players) if players else 0)
+        for quiz_id, best_score, above, below, players in rows
+    }
+
+
+def standing(user_id, quiz_id):
+    """The user's ``Standing`` on one quiz, or None if they haven't taken it."""
+    return standings(user_id, [quiz_id]).get(quiz_id)
@@ -1,16 +1,15 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from flask_bcrypt import Bcrypt
 from datetime import datetime, timezone
+from passwords import bcrypt, hash_password, verify_password, needs_rehash
 
-# Initialize database and bcrypt for password hashing
+# Initialize database (bcrypt lives in passwords.py)
 db = SQLAlchemy()
-bcrypt = Bcrypt()
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)  
     email = db.Column(db.String(100), unique=True, nullable=False)  
-    username = db.Column(db.String(100), nullable=False)
+    username = db.Column(db.String(100), nullable=False, index=True)  # login lookup
     qualification = db.Column(db.String(100), nullable=False) 
     dob = db.Column(db.Date, nullable=False) 
     password_hash = db.Column(db.String(200), nullable=False)  
@@ -25,10 +24,14 @@ class User(db.Model, UserMixin):
         return self.role == "admin" or self.isadmin
 
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)    
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """True if the stored hash predates a change of BCRYPT_LOG_ROUNDS."""
+        return needs_rehash(self.password_hash)
 
 
     def get_id(self):
@@ -38,30 +41,38 @@ class Subject(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), unique=True, nullable=False)
     description = db.Column(db.Text)
+    chapter_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")  # see counters.py
 
     chapters = db.relationship('Chapter', backref='subject', cascade="all, delete-orphan", passive_deletes=True, lazy=True)
 
 class Chapter(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id', ondelete="CASCADE"), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id', ondelete="CASCADE"), nullable=False, index=True)
     name = db.Column(db.String(128), nullable=False)
+    quiz_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")  # see counters.py
 
     quizzes = db.relationship('Quiz', backref='chapter', cascade="all, delete-orphan", passive_deletes=True, lazy=True)
 
 class Quiz(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
-    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id', ondelete="CASCADE"), nullable=False)
-    date_of_quiz = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id', ondelete="CASCADE"), nullable=False, index=True)
+    date_of_quiz = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), index=True)
     time_duration = db.Column(db.Integer, nullable=False)
     total_qsn = db.Column(db.Integer, nullable=False, default=0)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")  # see fragments.py
 
     questions = db.relationship('Question', backref='quiz', cascade="all, delete-orphan", passive_deletes=True, lazy=True)
     scores = db.relationship('Score', backref='quiz', cascade="all, delete-orphan", passive_deletes=True, lazy=True)
 
+    @property
+    def cache_key(self):
+        """Changes with every edit; the creation time keeps a reused id from matching a deleted quiz."""
+        return f"{self.id}.{self.version}.{self.date_of_quiz.isoformat()}"
+
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete="CASCADE"), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete="CASCADE"), nullable=False, index=True)
     question_title = db.Column(db.String, nullable=False)
     question_statement = db.Column(db.Text, nullable=False)
     option1 = db.Column(db.String(128))
@@ -71,12 +82,84 @@ class Question(db.Model):
     correct_option = db.Column(db.String(10), nullable=False)
 
 class Score(db.Model):
+    # (user_id, ...) and (quiz_id, ...) also serve lookups on user_id or quiz_id alone
+    __table_args__ = (
+        db.Index('ix_score_user_id_timestamp', 'user_id', 'timestamp_of_attempt'),
+        db.Index('ix_score_quiz_id_total_score', 'quiz_id', 'total_score'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete="CASCADE"), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False)
-    timestamp_of_attempt = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    timestamp_of_attempt = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), index=True)
     total_score = db.Column(db.Integer)
+    # The attempt this score came from; unique so a retried submission can't count twice
+    attempt_id = db.Column(db.Integer, db.ForeignKey('attempt.id', ondelete="SET NULL"), unique=True, index=True)
 
 
+# Server-side quiz attempts; answers are written in batches while the user navigates (see attempts.py)
 
-    
\ No newline at end of file
+class Attempt(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False, index=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete="CASCADE"), nullable=False, index=True)
+    question_ids = db.Column(db.Text, nullable=False)  # JSON list, question order fixed at start
+    started_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    submitted_at = db.Column(db.DateTime)
+    score = db.Column(db.Integer)
+
+class Answer(db.Model):
+    attempt_id = db.Column(db.Integer, db.ForeignKey('attempt.id', ondelete="CASCADE"), primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id', ondelete="CASCADE"), primary_key=True, index=True)
+    selected_option = db.Column(db.String(10), nullable=False)
+
+
+# Rollups of the Score table, updated in the same transaction as each new Score (see stats.py)
+
+class QuizStat(db.Model):
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete="CASCADE"), primary_key=True)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    min_score = db.Column(db.Integer)
+    max_score = db.Column(db.Integer)
+
+class SubjectStat(db.Model):
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id', ondelete="CASCADE"), primary_key=True)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+
+class UserStat(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), primary_key=True)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+
+class UserQuizStat(db.Model):
+    # leaderboard top-N: a quiz's rows ordered by best score
+    __table_args__ = (db.Index('ix_user_quiz_stat_quiz_id_max_score', 'quiz_id', 'max_score'),)
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete="CASCADE"), primary_key=True, index=True)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    min_score = db.Column(db.Integer)
+    max_score = db.Column(db.Integer)
+
+class QuizScoreBucket(db.Model):
+    """How many users have ``score`` as their best score on a quiz (see leaderboard.py)."""
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete="CASCADE"), primary_key=True)
+    score = db.Column(db.Integer, primary_key=True)
+    user_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DataVersion(db.Model):
+    key = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+
+def upsert(model, values, index_elements, set_):
+    """INSERT ... ON CONFLICT DO UPDATE for SQLite and PostgreSQL."""
+    if db.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model).values(values).on_conflict_do_update(index_elements=index_elements, set_=set_)
@@ -0,0 +1,72 @@
+"""Password hashing on a bounded worker pool.
+
+bcrypt is deliberately slow, and a burst of logins used to pin every request
+thread.  Hashes and checks now run on at most ``BCRYPT_MAX_CONCURRENCY``
+worker threads (bcrypt releases the GIL, so they run in parallel), leaving CPU
+for other requests.  A caller that waits longer than
+``BCRYPT_QUEUE_TIMEOUT`` seconds for a free worker gets ``PasswordBusy``; the
+hash itself is not timed.
+
+Outside an app context (scripts, the shell) the work runs inline.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+from flask_bcrypt import Bcrypt
+
+bcrypt = Bcrypt()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class PasswordBusy(Exception):
+    """Every password worker stayed busy for the whole queue timeout."""
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config["BCRYPT_MAX_CONCURRENCY"],
+                    thread_name_prefix="bcrypt",
+                )
+    return _executor
+
+
+def _run(fn, *args):
+    if not has_app_context():
+        return fn(*args)
+
+    started = threading.Event()
+
+    def job():
+        started.set()
+        return fn(*args)
+
+    # Only the wait for a worker is timed; a hash that has started runs to the end
+    future = get_executor().submit(job)
+    if not started.wait(current_app.config["BCRYPT_QUEUE_TIMEOUT"]) and future.cancel():
+        raise PasswordBusy()
+    return future.result()
+
+
+def hash_password(password):
+    """A bcrypt hash of ``password`` at the configured work factor."""
+    return _run(bcrypt.generate_password_hash, password).decode("utf-8")
+
+
+def verify_password(password_hash, password):
+    return _run(bcrypt.check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """True if the hash was made with a different work factor than the current one."""
+    try:
+        rounds = int(password_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != bcrypt._log_rounds
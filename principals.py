@@ -0,0 +1,87 @@
+"""Cached login principals for Flask-Login's ``user_loader``.
+
+Every authenticated request used to load the full ``User`` row just to learn
+the id, name and role.  ``load_principal`` keeps a small read-only ``Principal``
+per user id in a bounded TTL/LRU cache instead.  ORM updates and deletes of a
+user evict the entry once the transaction commits; bulk ``UPDATE``/``DELETE``
+statements on the user table must call ``evict`` themselves, and the TTL bounds
+staleness for other worker processes.
+"""
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from cache import LRUCache
+from models import db, User
+
+_cache = None
+
+
+class Principal(UserMixin):
+    """The parts of a user the request path needs; not attached to a session."""
+
+    __slots__ = ("id", "username", "role", "isadmin")
+
+    def __init__(self, id, username, role, isadmin):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.isadmin = isadmin
+
+    @property
+    def is_admin(self):
+        return self.role == "admin" or bool(self.isadmin)
+
+    def get_id(self):
+        return str(self.id)
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(
+            maxsize=current_app.config["PRINCIPAL_CACHE_SIZE"],
+            ttl=current_app.config["PRINCIPAL_CACHE_TTL"],
+        )
+    return _cache
+
+
+def load_principal(user_id):
+    """The principal for ``user_id``, or None if the user does not exist."""
+    return get_cache().get_or_create(user_id, lambda: _load(user_id))
+
+
+def evict(user_id):
+    get_cache().pop(user_id)
+
+
+def _load(user_id):
+    row = db.session.execute(
+        db.select(User.id, User.username, User.role, User.isadmin).where(User.id == user_id)
+    ).first()
+    return Principal(*row) if row else None
+
+
+# eviction.......................
+
+
+def _mark_changed(mapper, connection, target):
+    inspect(target).session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+
+event.listen(User, "after_update", _mark_changed)
+event.listen(User, "after_delete", _mark_changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_committed(session):
+    user_ids = session.info.pop("changed_user_ids", None)
+    if user_ids and _cache is not None:
+        for user_id in user_ids:
+            _cache.pop(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session):
+    session.info.pop("changed_user_ids", None)
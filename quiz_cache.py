@@ -0,0 +1,58 @@
+"""Shared per-quiz cache of question bodies for the quiz-taking pages.
+
+A snapshot holds the quiz header and its questions in order, loaded with two
+queries the first time any user opens the quiz.  Admin edits to a quiz or its
+questions call ``invalidate``; the TTL bounds staleness for other workers.
+"""
+from collections import namedtuple
+
+from flask import current_app
+
+from cache import LRUCache
+from models import db, Quiz, Question
+
+QuizSnapshot = namedtuple("QuizSnapshot", "id name time_duration question_ids questions")
+QuestionView = namedtuple(
+    "QuestionView",
+    "id question_title question_statement option1 option2 option3 option4 correct_option",
+)
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(
+            maxsize=current_app.config["QUIZ_CACHE_SIZE"],
+            ttl=current_app.config["QUIZ_CACHE_TTL"],
+        )
+    return _cache
+
+
+def get_quiz(quiz_id):
+    """The quiz snapshot, or None if the quiz does not exist."""
+    return get_cache().get_or_create(quiz_id, lambda: _load(quiz_id))
+
+
+def invalidate(quiz_id=None):
+    """Drops one quiz (or every quiz when ``quiz_id`` is None) from the cache."""
+    if quiz_id is None:
+        get_cache().clear()
+    else:
+        get_cache().pop(quiz_id)
+
+
+def _load(quiz_id):
+    quiz = db.session.get(Quiz, quiz_id)
+    if quiz is None:
+        return None
+
+    rows = (
+        db.session.query(*[getattr(Question, field) for field in QuestionView._fields])
+        .filter(Question.quiz_id == quiz_id)
+        .order_by(Question.id)
+        .all()
+    )
+    questions = {row.id: QuestionView(*row) for row in rows}
+    return QuizSnapshot(quiz.id, quiz.name, quiz.time_duration, [row.id for row in rows], questions)
@@ -1,16 +1,26 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash,session
+from flask import Blueprint, render_template, request, redirect, url_for, flash,session, current_app, abort, make_response, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import UserMixin
-from flask_bcrypt import Bcrypt
 from datetime import datetime, timezone
 from models import *
-from config import Config
-import matplotlib
-matplotlib.use('Agg')  # Use non-GUI backend for Matplotlib
-import matplotlib.pyplot as plt
-import io
-import base64
+from http_cache import conditional
+from passwords import PasswordBusy
+from sqlalchemy import tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload, selectinload
+import search
+import analytics
+import attempts
+import bulk_io
+import catalog
+import charts
+import counters
+import fragments
+import leaderboard
+import principals
+import quiz_cache
+import score_queue
+import stats
+import versions
 
 
 # Create Blueprint for routes
@@ -39,7 +49,11 @@ def register():
 
         # Create new user
         new_user = User(email=email, username=username, qualification=qualification, dob=dob)
-        new_user.set_password(password)  # Hash the password
+        try:
+            new_user.set_password(password)  # Hash the password
+        except PasswordBusy:
+            flash("Too many sign-ups right now, please try again in a moment.", "warning")
+            return redirect(url_for("app_routes.register"))
         db.session.add(new_user)
         db.session.commit()
 
@@ -57,7 +71,16 @@ def login():
         user = User.query.filter_by(username=username).first()
 
         # Check credentials
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and user.check_password(password)
+            if valid and user.password_needs_rehash():
+                user.set_password(password)  # work factor changed since the hash was made
+                db.session.commit()
+        except PasswordBusy:
+            flash("Too many logins right now, please try again in a moment.", "warning")
+            return render_template("login.html")
+
+        if valid:
             login_user(user)
             flash("Login successful!", "success")
 
@@ -80,12 +103,32 @@ def logout():
 
 
 
+def build_subject_tree():
+    """Builds the subject -> chapter tree in one query; quiz counts come from Chapter.quiz_count."""
+    rows = (
+        db.session.query(Subject, Chapter)
+        .outerjoin(Chapter, Subject.id == Chapter.subject_id)
+        .order_by(Subject.id, Chapter.id)
+        .all()
+    )
+
+    subject_tree = []
+    for subject, chapter in rows:
+        if not subject_tree or subject_tree[-1]["subject"] is not subject:
+            subject_tree.append({"subject": subject, "chapters": []})
+        if chapter is not None:
+            subject_tree[-1]["chapters"].append((chapter, chapter.quiz_count))
+
+    return subject_tree
+
+
 @app_routes.route('/admin_dashboard', methods=['GET'])
 @login_required
+@conditional(versions.CATALOG)
 def admin_dashboard():
     try:
-        subjects = Subject.query.outerjoin(Chapter).outerjoin(Quiz).all()
-        return render_template('admin_dashboard.html', subjects=subjects)
+        subject_tree = build_subject_tree()
+        return render_template('admin_dashboard.html', subject_tree=subject_tree)
 
     except Exception as e:
         flash(f"Error loading admin dashboard: {str(e)}", "error")
@@ -113,6 +156,7 @@ def add_subject():
 
         new_sub = Subject(name=name, description=description)
         db.session.add(new_sub)
+        versions.bump(versions.CATALOG)
         db.session.commit()
 
         flash('Subject added successfully.', 'success')
@@ -149,6 +193,8 @@ def update_subject(id):
 
         subject.name = name
         subject.description = description
+        fragments.touch_quizzes(Quiz.chapter_id.in_(db.select(Chapter.id).where(Chapter.subject_id == id)))
+        versions.bump(versions.CATALOG)
         db.session.commit()
 
         flash('Subject updated successfully.', 'success')
@@ -167,8 +213,11 @@ def update_subject(id):
 @login_required
 def delete_subject(id):
     try:
-        subject = Subject.query.get_or_404(id)
-        db.session.delete(subject)
+        if not catalog.delete_subject(id):
+            flash("Subject not found", "error")
+            return redirect(url_for('app_routes.admin_dashboard'))
+        versions.bump(versions.CATALOG)
+        quiz_cache.invalidate()
         db.session.commit()
 
         flash("Subject deleted successfully!", "success")
@@ -182,6 +231,7 @@ def delete_subject(id):
 @app_routes.route('/add_chapter/<int:subject_id>', methods=['POST'])
 @login_required
 def add_chapter(subject_id):
+    Subject.query.get_or_404(subject_id)
     try:
         name = request.form.get('name', '').strip()
         print(f"Received chapter name: {name}, Subject ID: {subject_id}")  # Debugging
@@ -197,6 +247,8 @@ def add_chapter(subject_id):
 
         new_chapter = Chapter(name=name, subject_id=subject_id)
         db.session.add(new_chapter)
+        counters.add(Subject.chapter_count, subject_id)
+        versions.bump(versions.CATALOG)
         db.session.commit()
 
         flash('Chapter added successfully.', 'success')
@@ -231,6 +283,8 @@ def update_chapter(id):
             return redirect(url_for('app_routes.admin_dashboard'))
 
         chapter.name = name
+        fragments.touch_quizzes(Quiz.chapter_id == id)
+        versions.bump(versions.CATALOG)
         db.session.commit()
 
         flash('Chapter updated successfully.', 'success')
@@ -248,13 +302,12 @@ def update_chapter(id):
 @login_required
 def delete_chapter(id):
     try:
-        chapter = Chapter.query.get(id)
-        if not chapter:
+        if not catalog.delete_chapter(id):
             flash('Chapter not found', 'error')
             return redirect(url_for('app_routes.admin_dashboard'))
-        
-        # Delete chapter
-        db.session.delete(chapter)
+
+        versions.bump(versions.CATALOG)
+        quiz_cache.invalidate()
         db.session.commit()
 
         flash('Chapter deleted successfully.', 'success')
@@ -273,13 +326,41 @@ def delete_chapter(id):
 
 
 
-# - List all quizzes
+# - List quizzes, one keyset page at a time (newest first)
 @app_routes.route("/quiz_mngmnt")
+@conditional(versions.CATALOG)
 def quiz_mngmnt():
-    chapters = Chapter.query.all()
-    questions = Question.query.all() 
-    quizzes = Quiz.query.order_by(Quiz.id.desc()).all() 
-    return render_template("quiz_mngmnt.html", quizzes=quizzes,chapters=chapters,questions=questions)
+    page_size = current_app.config["QUIZ_PAGE_SIZE"]
+    before_id = request.args.get("before", type=int)
+
+    query = Quiz.query.options(joinedload(Quiz.chapter).joinedload(Chapter.subject))
+    if before_id:
+        query = query.filter(Quiz.id < before_id)
+    quizzes = query.order_by(Quiz.id.desc()).limit(page_size + 1).all()
+
+    # The extra row only tells us whether an older page exists
+    next_before_id = None
+    if len(quizzes) > page_size:
+        quizzes = quizzes[:page_size]
+        next_before_id = quizzes[-1].id
+
+    chapters = db.session.query(Chapter.id, Chapter.name).order_by(Chapter.name).all()
+    return render_template("quiz_mngmnt.html", quizzes=quizzes, chapters=chapters,
+                           next_before_id=next_before_id, is_first_page=not before_id)
+
+
+# - Question list + edit forms of one quiz, fetched when the admin expands it
+@app_routes.route("/quiz_mngmnt/<int:quiz_id>/questions")
+@login_required
+def quiz_questions(quiz_id):
+    # The fragment includes every correct_option
+    if not current_user.is_admin:
+        abort(403)
+
+    quiz = Quiz.query.get_or_404(quiz_id)
+    # Run by the template only when the fragment isn't cached
+    questions = Question.query.filter_by(quiz_id=quiz_id).order_by(Question.id)
+    return render_template("quiz_questions.html", quiz=quiz, questions=questions)
 
 
 # add quiz route
@@ -333,6 +414,8 @@ def add_quiz():
     )
     
     db.session.add(new_quiz)
+    counters.add(Chapter.quiz_count, chapter_id)
+    versions.bump(versions.CATALOG)
     db.session.commit()
 
     flash("Quiz added successfully!", "success")
@@ -345,7 +428,10 @@ def update_quiz(id):
     quiz = Quiz.query.get_or_404(id)
     quiz.name = request.form.get("quiz_name")
     quiz.time_duration = request.form.get("quiz_duration")
+    fragments.touch_quizzes(Quiz.id == id)
 
+    versions.bump(versions.CATALOG)
+    quiz_cache.invalidate(id)
     db.session.commit()
     flash("Quiz updated successfully!", "success")
     return redirect(url_for("app_routes.quiz_mngmnt"))
@@ -353,11 +439,11 @@ def update_quiz(id):
 # Delete a quiz
 @app_routes.route("/delete_quiz/<int:id>", methods=["POST"])
 def delete_quiz(id):
-    quiz = Quiz.query.get_or_404(id)
-
-    # Delete associated questions before deleting quiz
-    Question.query.filter_by(quiz_id=id).delete()
-    db.session.delete(quiz)
+    # Questions, attempts and scores go with it (ON DELETE CASCADE)
+    if not catalog.delete_quiz(id):
+        abort(404)
+    versions.bump(versions.CATALOG)
+    quiz_cache.invalidate(id)
     db.session.commit()
 
     flash("Quiz deleted successfully!", "success")
@@ -368,7 +454,7 @@ def delete_quiz(id):
 # Add a new question (...this updates total_qsn dynamically)
 @app_routes.route("/add_question/<int:quiz_id>", methods=["POST"])
 def add_question(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
+    Quiz.query.get_or_404(quiz_id)
 
     question_title = request.form.get("question_title")
     question_statement = request.form.get("question_statement")
@@ -394,14 +480,65 @@ def add_question(quiz_id):
     )
 
     db.session.add(new_question)
-    db.session.commit()  
-    quiz.total_qsn = len(quiz.questions)  
-    
+    counters.add(Quiz.total_qsn, quiz_id)
+    fragments.touch_quizzes(Quiz.id == quiz_id)
 
+    versions.bump(versions.CATALOG)
+    quiz_cache.invalidate(quiz_id)
     db.session.commit()
     flash("Question added successfully!", "success")
     return redirect(url_for("app_routes.quiz_mngmnt"))
 
+# Bulk import questions from a CSV / JSON Lines upload (one quiz, or whole subject trees)
+@app_routes.route("/admin/questions/import", methods=["POST"])
+@login_required
+def import_questions():
+    if not current_user.is_admin:
+        flash("Unauthorized access!", "danger")
+        return redirect(url_for('app_routes.user_dashboard'))
+
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        flash("Please choose a CSV or JSON Lines file to import.", "danger")
+        return redirect(url_for("app_routes.quiz_mngmnt"))
+
+    quiz_id = request.form.get("quiz_id", type=int)
+    if quiz_id is not None and not db.session.get(Quiz, quiz_id):
+        flash("Selected quiz does not exist!", "danger")
+        return redirect(url_for("app_routes.quiz_mngmnt"))
+
+    fmt = bulk_io.format_for(upload.filename, default=None)
+    if fmt is None:
+        flash("Please upload a .csv or .jsonl (JSON Lines) file.", "danger")
+        return redirect(url_for("app_routes.quiz_mngmnt"))
+    result = bulk_io.import_questions(upload.stream, fmt, quiz_id=quiz_id)
+
+    flash(f"Imported {result.inserted} questions ({result.created_quizzes} new quizzes).", "success")
+    if result.error_count:
+        flash(f"Skipped {result.error_count} invalid rows: " + "; ".join(result.errors), "warning")
+    return redirect(url_for("app_routes.quiz_mngmnt"))
+
+
+# Streamed export of one quiz's questions, or of every subject tree
+@app_routes.route("/admin/questions/export")
+@login_required
+def export_questions():
+    if not current_user.is_admin:
+        abort(403)
+
+    fmt = request.args.get("format", "csv")
+    if fmt not in bulk_io.FORMATS:
+        abort(400)
+    quiz_id = request.args.get("quiz_id", type=int)
+
+    filename = f"quiz_{quiz_id}_questions.{fmt}" if quiz_id else f"questions.{fmt}"
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(
+        stream_with_context(bulk_io.export_questions(fmt, quiz_id)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
 # Update a question
 @app_routes.route("/update_question/<int:id>", methods=["POST"])
 def update_question(id):
@@ -414,7 +551,10 @@ def update_question(id):
     question.option3 = request.form.get("option3")
     question.option4 = request.form.get("option4")
     question.correct_option = request.form.get("correct_option")
+    fragments.touch_quizzes(Quiz.id == question.quiz_id)
 
+    versions.bump(versions.CATALOG)
+    quiz_cache.invalidate(question.quiz_id)
     db.session.commit()
     flash("Question updated successfully!", "success")
     return redirect(url_for("app_routes.quiz_mngmnt"))
@@ -423,13 +563,14 @@ def update_question(id):
 @app_routes.route("/delete_question/<int:id>", methods=["POST"])
 def delete_question(id):
     question = Question.query.get_or_404(id)
-    quiz = Quiz.query.get(question.quiz_id)
+    quiz_id = question.quiz_id
 
     db.session.delete(question)
-    
-    # Update total_qsn count after deleting the question
-    quiz.total_qsn = Question.query.filter_by(quiz_id=quiz.id).count()
+    counters.add(Quiz.total_qsn, quiz_id, -1)
+    fragments.touch_quizzes(Quiz.id == quiz_id)
 
+    versions.bump(versions.CATALOG)
+    quiz_cache.invalidate(quiz_id)
     db.session.commit()
     flash("Question deleted successfully!", "success")
     return redirect(url_for("app_routes.quiz_mngmnt"))
@@ -438,9 +579,14 @@ def delete_question(id):
 
 @app_routes.route('/dashboard')
 @login_required
+@conditional(versions.CATALOG)
 def user_dashboard():
     """Fetch all available quizzes for the user."""
-    quizzes = Quiz.query.order_by(Quiz.date_of_quiz.desc()).all()
+    quizzes = (
+        Quiz.query.options(selectinload(Quiz.chapter).selectinload(Chapter.subject))
+        .order_by(Quiz.date_of_quiz.desc())
+        .all()
+    )
     return render_template('user_dashboard.html', quizzes=quizzes)
 
 
@@ -460,41 +606,33 @@ def admin_search():
 
     query = request.args.get('q', '').strip().lower() 
     search_type = request.args.get('type', 'all')  
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = current_app.config["SEARCH_PAGE_SIZE"]
 
-    users, subjects, quizzes, questions, chapters = [], [], [], [], []
+    type_kinds = {
+        'users': 'user',
+        'subjects': 'subject',
+        'chapters': 'chapter',
+        'quizzes': 'quiz',
+        'questions': 'question',
+    }
+    kinds = list(type_kinds.values()) if search_type == 'all' else [type_kinds.get(search_type)]
 
-    if query:
-        # Search Users
-        if search_type in ('all', 'users'):
-            users = User.query.filter(
-                (User.username.ilike(f"%{query}%")) | (User.email.ilike(f"%{query}%"))
-            ).all()
-
-        # Search Subjects
-        if search_type in ('all', 'subjects'):
-            subjects = Subject.query.filter(Subject.name.ilike(f"%{query}%")).all()
-
-        # Search Quizzes
-        if search_type in ('all', 'quizzes'):
-            quizzes = Quiz.query.filter(Quiz.name.ilike(f"%{query}%")).all()
-
-        # Search Questions
-        if search_type in ('all', 'questions'):
-            questions = Question.query.filter(Question.question_statement.ilike(f"%{query}%")).all()
-
-        # Search Chapters
-        if search_type in ('all', 'chapters'):
-            chapters = Chapter.query.filter(Chapter.name.ilike(f"%{query}%")).all()
+    hits, total = search.search(query, kinds, page, per_page) if query else ([], 0)
+    results = search.load_hits(hits)
 
     return render_template(
         'admin_search.html',
         query=query,
-        users=users,
-        subjects=subjects,
-        quizzes=quizzes,
-        questions=questions,
-        chapters=chapters,  
-        search_type=search_type
+        users=results['user'],
+        subjects=results['subject'],
+        quizzes=results['quiz'],
+        questions=results['question'],
+        chapters=results['chapter'],  
+        search_type=search_type,
+        page=page,
+        total=total,
+        has_next=page * per_page < total
     )
 
 # user search.................
@@ -505,6 +643,8 @@ def admin_search():
 def user_search():
     """Allows users to search for subjects, quizzes, chapters, and scores."""
     query = request.args.get('q', '').strip().lower()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = current_app.config["SEARCH_PAGE_SIZE"]
 
     if not query:
         flash("Please enter a search term.", "warning")
@@ -512,18 +652,31 @@ def user_search():
 
     user_id = current_user.id  
 
-    subjects = Subject.query.filter(Subject.name.ilike(f"%{query}%")).all()
-    chapters = Chapter.query.filter(Chapter.name.ilike(f"%{query}%")).all()
-    quizzes = Quiz.query.filter(Quiz.name.ilike(f"%{query}%")).all()
-    scores = Score.query.filter_by(user_id=user_id).join(Quiz).filter(Quiz.name.ilike(f"%{query}%")).all()
+    hits, total = search.search(query, ['subject', 'chapter', 'quiz'], page, per_page)
+    results = search.load_hits(hits)
+
+    # Scores are only listed with the first page of catalog hits
+    scores = []
+    if page == 1:
+        quiz_ids = search.matching_ids(query, 'quiz')
+        if quiz_ids:
+            scores = (
+                Score.query.options(joinedload(Score.quiz))
+                .filter(Score.user_id == user_id, Score.quiz_id.in_(quiz_ids))
+                .order_by(Score.id.desc())
+                .all()
+            )
 
     return render_template(
         "user_search.html",
         query=query,
-        subjects=subjects,
-        chapters=chapters,
-        quizzes=quizzes,
-        scores=scores
+        subjects=results['subject'],
+        chapters=results['chapter'],
+        quizzes=results['quiz'],
+        scores=scores,
+        page=page,
+        total=total,
+        has_next=page * per_page < total
     )
 #   user scores.....................
 
@@ -532,124 +685,97 @@ def user_search():
 @app_routes.route('/user/scores')
 @login_required
 def user_scores():
-    """Fetch and display user's past quiz scores categorized by subject, chapter, and quiz."""
+    """The user's past quiz scores, newest first, one keyset page at a time."""
     user_id = current_user.id  
+    page_size = current_app.config["SCORE_PAGE_SIZE"]
+    before_id = request.args.get("before", type=int)
 
-    
-    scores = (
+    query = (
         db.session.query(Score, Quiz, Chapter, Subject)
         .join(Quiz, Score.quiz_id == Quiz.id)
         .join(Chapter, Quiz.chapter_id == Chapter.id)
         .join(Subject, Chapter.subject_id == Subject.id)
         .filter(Score.user_id == user_id)
-        .order_by(Score.id.desc())  
-        .all()
     )
+    if before_id:
+        # Continue after the last score shown: (timestamp, id) below that score's
+        before = db.session.query(Score.timestamp_of_attempt).filter(Score.id == before_id).scalar_subquery()
+        query = query.filter(tuple_(Score.timestamp_of_attempt, Score.id) < tuple_(before, before_id))
+    scores = query.order_by(Score.timestamp_of_attempt.desc(), Score.id.desc()).limit(page_size + 1).all()
 
-    return render_template("user_scores.html", scores=scores)
+    # The extra row only tells us whether an older page exists
+    next_before_id = None
+    if len(scores) > page_size:
+        scores = scores[:page_size]
+        next_before_id = scores[-1][0].id
 
-# user summary.......................
+    standings = leaderboard.standings(user_id, list({quiz.id for _, quiz, _, _ in scores}))
+    return render_template("user_scores.html", scores=scores, standings=standings,
+                           next_before_id=next_before_id, is_first_page=not before_id)
 
 
+@app_routes.route('/user/scores/export.csv')
+@login_required
+def export_user_scores():
+    """The user's whole score history as a streamed CSV download."""
+    return Response(
+        stream_with_context(bulk_io.export_user_scores(current_user.id)),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=quiz_scores.csv"},
+    )
 
-@app_routes.route('/user/summary')
+
+@app_routes.route('/quiz/<int:quiz_id>/leaderboard')
 @login_required
-def user_summary():
-    """Generates user quiz summary with statistics and Matplotlib charts."""
-    user_id = current_user.id  
+def quiz_leaderboard(quiz_id):
+    """The quiz's top players by best score, and the current user's rank."""
+    quiz = db.session.get(Quiz, quiz_id)
+    if quiz is None:
+        abort(404)
 
-    total_quizzes = Score.query.filter_by(user_id=user_id).count()
-    avg_score = db.session.query(db.func.avg(Score.total_score)).filter(Score.user_id == user_id).scalar() or 0
+    return render_template("leaderboard.html",
+                           quiz=quiz,
+                           entries=leaderboard.top(quiz_id, current_app.config["LEADERBOARD_SIZE"]),
+                           standing=leaderboard.standing(current_user.id, quiz_id))
 
-    subject_data = (
-        db.session.query(Subject.name, db.func.count(Score.id))
-        .join(Chapter, Subject.id == Chapter.subject_id)
-        .join(Quiz, Chapter.id == Quiz.chapter_id)
-        .join(Score, Quiz.id == Score.quiz_id)
-        .filter(Score.user_id == user_id)
-        .group_by(Subject.name)
-        .all()
-    )
-    
-    score_data = (
-        db.session.query(Score.timestamp_of_attempt, Score.total_score)
-        .filter(Score.user_id == user_id)
-        .order_by(Score.timestamp_of_attempt)
-        .all()
-    )
+# user summary.......................
 
-    score_extremes = (
-        db.session.query(Quiz.name, db.func.max(Score.total_score), db.func.min(Score.total_score))
-        .join(Score, Quiz.id == Score.quiz_id)
-        .filter(Score.user_id == user_id)
-        .group_by(Quiz.name)
-        .all()
-    )
 
-  
-    subject_labels, subject_counts = zip(*subject_data) if subject_data else ([], [])
-    fig, ax = plt.subplots(figsize=(6, 5))
-    if subject_labels:
-        ax.pie(subject_counts, labels=subject_labels, autopct='%1.1f%%', colors=['#ff9999','#66b3ff','#99ff99','#ffcc99'])
-        ax.set_title("Quiz Attempts Per Subject")
-    else:
-        ax.text(0.5, 0.5, "No Data Available", ha='center', va='center', fontsize=12)
-    
-    img1 = io.BytesIO()
-    plt.savefig(img1, format='png', bbox_inches='tight')
-    img1.seek(0)
-    subject_chart = base64.b64encode(img1.getvalue()).decode()
-    plt.close()
-
-    timestamps, scores = zip(*score_data) if score_data else ([], [])
-    fig, ax = plt.subplots(figsize=(10, 5))
-    if timestamps:
-        ax.plot(timestamps, scores, marker='o', linestyle='-', color='#66b3ff')
-        ax.set_xlabel("Date")
-        ax.set_ylabel("Score")
-        ax.set_title("Quiz Scores Over Time")
-    else:
-        ax.text(0.5, 0.5, "No Data Available", ha='center', va='center', fontsize=12)
-
-    img2 = io.BytesIO()
-    plt.savefig(img2, format='png', bbox_inches='tight')
-    img2.seek(0)
-    score_chart = base64.b64encode(img2.getvalue()).decode()
-    plt.close()
-
-    quiz_labels, high_scores, low_scores = zip(*score_extremes) if score_extremes else ([], [], [])
-    fig, ax = plt.subplots(figsize=(6, 4))
-    if quiz_labels:
-        x = range(len(quiz_labels))
-        ax.bar(x, high_scores, color='green', alpha=0.6, label="High Scores")
-        ax.bar(x, low_scores, color='red', alpha=0.6, label="Low Scores")
-        ax.set_xticks(x)
-        ax.set_xticklabels(quiz_labels, rotation=45, ha='right')
-        ax.set_ylabel("Scores")
-        ax.set_title("Highest & Lowest Scores Per Quiz")
-        ax.legend()
-    else:
-        ax.text(0.5, 0.5, "No Data Available", ha='center', va='center', fontsize=12)
 
-    img3 = io.BytesIO()
-    plt.savefig(img3, format='png', bbox_inches='tight')
-    img3.seek(0)
-    extremes_chart = base64.b64encode(img3.getvalue()).decode()
-    plt.close()
+@app_routes.route('/user/summary')
+@login_required
+def user_summary():
+    """Shows the user's quiz statistics; the charts are served by user_chart."""
+    user_id = current_user.id  
+
+    user_stat = db.session.get(UserStat, user_id)
+    total_quizzes = user_stat.attempt_count if user_stat else 0
+    avg_score = user_stat.score_sum / user_stat.attempt_count if total_quizzes else 0
 
+    version = charts.user_version(user_id)
     return render_template("user_summary.html", 
                            total_quizzes=total_quizzes, 
                            avg_score=round(avg_score, 2), 
-                           subject_chart=subject_chart, 
-                           score_chart=score_chart, 
-                           extremes_chart=extremes_chart)
+                           analytics=analytics.user_summary(user_id, version),
+                           chart_version=version)
+
+
+@app_routes.route('/user/summary/charts/<name>.png')
+@login_required
+def user_chart(name):
+    """One of the user's summary charts, cached per data version."""
+    if name not in charts.USER_CHARTS:
+        abort(404)
+    version = charts.user_version(current_user.id)
+    png = charts.user_chart_png(name, current_user.id, version)
+    return chart_response(png, version)
 
 
 
 @app_routes.route('/admin/summary')
 @login_required
 def admin_summary():
-    """Generates an admin dashboard summary with Matplotlib charts."""
+    """Shows the admin statistics; the charts are served by admin_chart."""
     
     # Ensure only admin can access
     if not current_user.is_admin:
@@ -660,120 +786,114 @@ def admin_summary():
     total_quizzes = Quiz.query.count()
     total_questions = Question.query.count()
 
-    # Most attempted quizzes
-    quiz_attempts = (
-        db.session.query(Quiz.name, db.func.count(Score.id))
-        .join(Score, Quiz.id == Score.quiz_id)
-        .group_by(Quiz.name)
-        .order_by(db.func.count(Score.id).desc())
-        .limit(5)
-        .all()
-    )
-
-    # Subject-wise quiz attempts
-    subject_attempts = (
-        db.session.query(Subject.name, db.func.count(Score.id))
-        .join(Chapter, Subject.id == Chapter.subject_id)
-        .join(Quiz, Chapter.id == Quiz.chapter_id)
-        .join(Score, Quiz.id == Score.quiz_id)
-        .group_by(Subject.name)
-        .all()
-    )
-
-    # Highest & Lowest Scores Per Quiz
-    score_extremes = (
-        db.session.query(Quiz.name, db.func.max(Score.total_score), db.func.min(Score.total_score))
-        .join(Score, Quiz.id == Score.quiz_id)
-        .group_by(Quiz.name)
-        .all()
-    )
-
-    def plot_to_base64():
-        img = io.BytesIO()
-        plt.savefig(img, format='png')
-        img.seek(0)
-        return base64.b64encode(img.getvalue()).decode()
-
-    plt.figure(figsize=(7, 7))
-    plt.bar([q[0] for q in quiz_attempts], [q[1] for q in quiz_attempts], color='blue')
-    plt.xlabel("Quiz Name")
-    plt.ylabel("Attempts")
-    plt.title("Most Attempted Quizzes")
-    plt.xticks(rotation=30)
-    quiz_attempts_chart = plot_to_base64()
-    plt.close()
-
-    plt.figure(figsize=(7, 7))
-    plt.pie([s[1] for s in subject_attempts], labels=[s[0] for s in subject_attempts], autopct='%1.1f%%', colors=['red', 'blue', 'green', 'orange', 'purple'])
-    plt.title("Quiz Attempts Per Subject")
-    subject_attempts_chart = plot_to_base64()
-    plt.close()
-
-    plt.figure(figsize=(6, 6))
-    quizzes = [s[0] for s in score_extremes]
-    high_scores = [s[1] for s in score_extremes]
-    low_scores = [s[2] for s in score_extremes]
-    plt.bar(quizzes, high_scores, color='green', label="Highest Score")
-    plt.bar(quizzes, low_scores, color='red', label="Lowest Score")
-    plt.xlabel("Quiz Name")
-    plt.ylabel("Scores")
-    plt.title("Highest & Lowest Scores Per Quiz")
-    plt.legend()
-    plt.xticks(rotation=30)
-    extremes_chart = plot_to_base64()
-    plt.close()
-
+    version = charts.admin_version()
     return render_template("admin_summary.html",
                            total_users=total_users,
                            total_quizzes=total_quizzes,
                            total_questions=total_questions,
-                           quiz_attempts_chart=quiz_attempts_chart,
-                           subject_attempts_chart=subject_attempts_chart,
-                           extremes_chart=extremes_chart)
+                           analytics=analytics.admin_summary(versions.version_token(versions.CATALOG)),
+                           chart_version=version)
 
-# user_quiz routes...............
 
+@app_routes.route('/admin/summary/charts/<name>.png')
+@login_required
+def admin_chart(name):
+    """One of the admin summary charts, cached per data version."""
+    if not current_user.is_admin:
+        abort(403)
+    if name not in charts.ADMIN_CHARTS:
+        abort(404)
+    version = charts.admin_version()
+    png = charts.admin_chart_png(name, version)
+    return chart_response(png, version)
+
+
+@app_routes.route('/admin/cache_stats')
+@login_required
+def admin_cache_stats():
+    """Hit/miss counters of the in-process caches, for sizing them."""
+    if not current_user.is_admin:
+        abort(403)
+    return {
+        "principals": principals.get_cache().stats(),
+        "quizzes": quiz_cache.get_cache().stats(),
+        "attempts": attempts.get_cache().stats(),
+        "charts": charts.get_cache().stats(),
+        "analytics": analytics.get_cache().stats(),
+        "fragments": fragments.get_cache().stats(),
+    }
+
+
+def chart_response(png, version):
+    """PNG response; URLs carrying the current version may be cached for good."""
+    response = make_response(png)
+    response.mimetype = "image/png"
+    if request.args.get("v") == version:
+        response.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+    else:
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+# user_quiz routes...............
 
-from datetime import datetime, timedelta
-from flask import session
 
 @app_routes.route('/quiz_page/<int:quiz_id>/<int:q_index>')
+@login_required
 def quiz_page(quiz_id, q_index):
-    quiz = Quiz.query.get(quiz_id)
-    
-    if 'quiz_start_time' not in session:
-        session['quiz_start_time'] = datetime.now().isoformat()
+    attempt = attempts.current_attempt(current_user.id, quiz_id)
+    if attempt is None:
+        return redirect(url_for('app_routes.start_quiz', quiz_id=quiz_id))
 
-    start_time = datetime.fromisoformat(session['quiz_start_time'])
-    end_time = start_time + timedelta(minutes=quiz.time_duration)
-    remaining_time = (end_time - datetime.now()).total_seconds()
+    quiz = quiz_cache.get_quiz(quiz_id)
+    if quiz is None:
+        abort(404)
+
+    end_time = attempts.deadline(attempt, quiz.time_duration)
+    remaining_time = (end_time - datetime.now(timezone.utc)).total_seconds()
 
     if remaining_time <= 0:
         return redirect(url_for('app_routes.submit_quiz', quiz_id=quiz.id))
 
-    question = Question.query.filter_by(quiz_id=quiz_id).offset(q_index).first()
+    question_ids = attempt.question_ids
+    q_index = min(q_index, max(len(question_ids) - 1, 0))
+    question = quiz.questions.get(question_ids[q_index]) if question_ids else None
 
     return render_template(
         'quiz_page.html', quiz=quiz, question=question, q_index=q_index, 
-        remaining_time=int(remaining_time)
+        total_questions=len(question_ids), remaining_time=int(remaining_time)
     )
 
 @app_routes.route('/start_quiz/<int:quiz_id>')
 @login_required
 def start_quiz(quiz_id):
-    """Redirects user to the quiz page."""
-    quiz = Quiz.query.get_or_404(quiz_id)
+    """Starts a new attempt with the quiz's question order fixed, then shows question 1."""
+    quiz = quiz_cache.get_quiz(quiz_id)
+    if quiz is None:
+        abort(404)
+
+    session.pop('quiz_responses', None)
+    attempts.start_attempt(current_user.id, quiz)
 
     return redirect(url_for('app_routes.quiz_page', quiz_id=quiz.id,q_index=0))
 
 
 
 @app_routes.route('/quiz/<int:quiz_id>/<int:q_index>/navigate', methods=['POST'])
+@login_required
 def navigate_question(quiz_id, q_index):
-    """Handles moving to the next, previous question, or submitting the quiz."""
-    
+    """Records the selected option, then moves to the next or previous question, or submits."""
+    attempt = attempts.current_attempt(current_user.id, quiz_id)
+    if attempt is None:
+        return redirect(url_for('app_routes.start_quiz', quiz_id=quiz_id))
+
+    question_ids = attempt.question_ids
+    quiz = quiz_cache.get_quiz(quiz_id)
+    in_time = quiz is not None and attempts.in_time(attempt, quiz.time_duration)
+    if in_time and 0 <= q_index < len(question_ids):
+        attempts.record_answer(attempt, question_ids[q_index], request.form.get("option"))
+
     direction = request.form.get("direction")  
-    total_questions = Question.query.filter_by(quiz_id=quiz_id).count()
+    total_questions = len(question_ids)
 
     if direction == "next":
         next_q_index = min(q_index + 1, total_questions - 1)
@@ -790,30 +910,39 @@ def navigate_question(quiz_id, q_index):
 @login_required
 def submit_quiz(quiz_id):
     """Submits quiz, calculates score, and stores result."""
-    quiz = Quiz.query.get_or_404(quiz_id)
     user_id = current_user.id  
 
-    responses = session.get('quiz_responses', {})
-
-    # Ensure quiz wasn't already submitted
-    # existing_score = Score.query.filter_by(user_id=user_id, quiz_id=quiz_id).first()
-    # if existing_score:
-    #     flash("You've already submitted this quiz.", "info")
-    #     return redirect(url_for('app_routes.user_dashboard'))
-
-    question_ids = [int(q_id) for q_id in responses.keys()]
-    questions = Question.query.filter(Question.id.in_(question_ids)).all()
-
-    question_dict = {q.id: q.correct_option for q in questions}
-
-    score = sum(1 for q_id, selected_option in responses.items() if question_dict.get(int(q_id)) == selected_option)
-
-    new_score = Score(user_id=user_id, quiz_id=quiz_id, total_score=score)
-    db.session.add(new_score)
-    db.session.commit()
+    attempt = attempts.current_attempt(user_id, quiz_id)
+    if attempt is None:
+        flash("There is no attempt of this quiz in progress.", "warning")
+        return redirect(url_for('app_routes.user_dashboard'))
 
-    session.pop('quiz_responses', None)
-    session.pop('quiz_start_time', None)
+    if current_app.config["SCORE_WRITE_BEHIND"]:
+        # Grade now, store later in a batch with other submissions (see score_queue.py)
+        quiz = quiz_cache.get_quiz(quiz_id)
+        if quiz is None:
+            abort(404)
+        score = attempts.grade_with_pending(attempt, quiz)
+        submitted = score_queue.enqueue(attempt, score)
+    else:
+        attempts.flush_answers(attempt)
+        score = attempts.grade(attempt.id)
+        submitted = attempts.mark_submitted(attempt.id, score)
+        if submitted:
+            new_score = Score(user_id=user_id, quiz_id=quiz_id, total_score=score, attempt_id=attempt.id)
+            db.session.add(new_score)
+            stats.record_score(user_id, quiz_id, score)
+            versions.bump(versions.user_key(user_id), versions.SCORES)
+            db.session.commit()
+        else:
+            db.session.rollback()
+
+    attempts.finish()
+
+    # Ensure the attempt wasn't already submitted (e.g. timer and button both fired)
+    if not submitted:
+        flash("You've already submitted this quiz.", "info")
+        return redirect(url_for('app_routes.user_dashboard'))
 
-    flash(f"Quiz submitted! Your score: {score}/{quiz.total_qsn}", "success")
+    flash(f"Quiz submitted! Your score: {score}/{len(attempt.question_ids)}", "success")
     return redirect(url_for('app_routes.user_dashboard'))
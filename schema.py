@@ -0,0 +1,118 @@
+"""Database setup, schema upgrades and a query-plan check for the hot queries.
+
+``db.create_all()`` only creates missing tables, so columns and indexes added
+to models.py later would never reach an existing ``quiz_master.db``.
+``upgrade_schema`` adds whatever is missing.
+"""
+from datetime import date
+
+from sqlalchemy import select, text
+from sqlalchemy.schema import CreateColumn
+
+from models import db, User, Chapter, Quiz, Question, Score, UserQuizStat
+from counters import COUNTERS, repair_counters
+from search import init_search_index
+
+
+def init_db():
+    """Creates missing tables, indexes and the search index, then the Admin user.
+
+    Safe to run on every deploy. Returns True if the Admin user was created.
+    """
+    db.create_all()
+    upgrade_schema()
+    init_search_index()
+    return create_default_admin()
+
+
+def create_default_admin():
+    """Creates the predefined Admin user unless an admin already exists."""
+    if User.query.filter_by(role='admin').first():
+        return False
+
+    admin = User(
+        username="Admin",
+        email="admin@example.com",
+        role="admin",
+        qualification="Master in Computer Science",
+        dob=date(1980, 1, 1),
+    )
+    admin.set_password("admin123")  # Hash password
+    db.session.add(admin)
+    db.session.commit()
+    return True
+
+
+def _references(column, preparer):
+    """The inline REFERENCES clause of a column's foreign key, so upgraded tables match new ones."""
+    clause = ""
+    for fk in column.foreign_keys:
+        target = fk.column
+        clause += f" REFERENCES {preparer.format_table(target.table)} ({preparer.quote(target.name)})"
+        if fk.ondelete:
+            clause += f" ON DELETE {fk.ondelete}"
+    return clause
+
+
+def upgrade_schema():
+    """Adds the columns and indexes declared in models.py that the database is missing.
+
+    New columns must be nullable (or have a server default) so that
+    ``ALTER TABLE ... ADD COLUMN`` works on every backend.  Returns the names
+    of the columns and indexes created.
+    """
+    created = []
+    with db.engine.begin() as conn:
+        preparer = conn.dialect.identifier_preparer
+        existing_tables = set(db.inspect(conn).get_table_names())
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {column["name"] for column in db.inspect(conn).get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    ddl = f"{CreateColumn(column).compile(dialect=conn.dialect)}{_references(column, preparer)}"
+                    conn.execute(text(f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}'))
+                    created.append(f"{table.name}.{column.name}")
+
+            existing = {index["name"] for index in db.inspect(conn).get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(conn)
+                    created.append(index.name)
+
+    # A new counter column starts at zero on existing rows
+    counter_columns = {f"{counter.class_.__tablename__}.{counter.key}" for counter, _ in COUNTERS}
+    if counter_columns.intersection(created):
+        repair_counters()
+    return created
+
+
+def hot_queries():
+    """The lookups every page view depends on, as (description, select) pairs."""
+    return [
+        ("login by username", select(User).where(User.username == "admin")),
+        ("user score history", select(Score).where(Score.user_id == 1).order_by(Score.timestamp_of_attempt)),
+        ("quiz scores by value", select(Score.total_score).where(Score.quiz_id == 1).order_by(Score.total_score.desc())),
+        ("questions of a quiz", select(Question).where(Question.quiz_id == 1).order_by(Question.id)),
+        ("quizzes of a chapter", select(Quiz).where(Quiz.chapter_id == 1)),
+        ("chapters of a subject", select(Chapter).where(Chapter.subject_id == 1)),
+        ("newest quizzes", select(Quiz).order_by(Quiz.date_of_quiz.desc()).limit(20)),
+        ("quiz leaderboard", select(UserQuizStat).where(UserQuizStat.quiz_id == 1).order_by(UserQuizStat.max_score.desc()).limit(10)),
+    ]
+
+
+def explain(stmt):
+    """SQLite's EXPLAIN QUERY PLAN lines for a select."""
+    sql = str(stmt.compile(db.engine, compile_kwargs={"literal_binds": True}))
+    return [row[-1] for row in db.session.execute(text("EXPLAIN QUERY PLAN " + sql))]
+
+
+def check_query_plans():
+    """Returns ``[(description, plan, ok)]``; a plan is ok if no table is fully scanned."""
+    results = []
+    for description, stmt in hot_queries():
+        plan = explain(stmt)
+        full_scan = any(line.startswith("SCAN ") and " USING " not in line for line in plan)
+        results.append((description, plan, not full_scan))
+    return results
@@ -0,0 +1,193 @@
+"""Optional write-behind queue for quiz submissions (``SCORE_WRITE_BEHIND``).
+
+When a timed quiz runs out, the whole class submits in the same second, and on
+SQLite every submission used to be its own write transaction.  With the queue
+on, ``submit_quiz`` grades from the quiz snapshot, shows the score right away
+and hands the submission to a background thread.  That thread writes
+everything queued in the last ``SCORE_BATCH_INTERVAL_MS`` as one transaction:
+the unsaved answers, the attempt's submitted mark, the Score row, the rollups
+and the data versions.
+
+Writes are idempotent per attempt: the conditional update in
+``attempts.mark_submitted`` and the unique ``Score.attempt_id`` mean a retried
+or duplicated submission never adds a second score, so failed batches are
+simply retried (at-least-once).  A submission that fails for any other
+reason is logged and appended to ``SCORE_DEAD_LETTER_FILE`` so it can be
+replayed, never silently dropped.  The queue lives in memory: it is drained on
+a clean shutdown, but a crash loses submissions from the last interval.
+"""
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from flask import current_app, session
+from sqlalchemy.exc import OperationalError
+
+from models import db, Score
+import attempts
+import stats
+import versions
+
+logger = logging.getLogger("quiz_master.score_queue")
+
+Submission = namedtuple("Submission", "attempt_id user_id quiz_id score answers submitted_at")
+
+RETRY_DELAY = 0.5  # seconds to wait after a failed batch, e.g. while the database is locked
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+class ScoreQueue:
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config["SCORE_BATCH_INTERVAL_MS"] / 1000
+        self.max_batch = app.config["SCORE_BATCH_MAX"]
+        self.dead_letter_file = app.config["SCORE_DEAD_LETTER_FILE"]
+        self._jobs = []
+        self._pending = set()  # attempt ids queued or being written
+        self._cond = threading.Condition()
+        self._thread = None
+        atexit.register(self.drain)
+
+    def submit(self, job):
+        """Queues a submission. Returns False if this attempt is already queued."""
+        with self._cond:
+            if job.attempt_id in self._pending:
+                return False
+            self._pending.add(job.attempt_id)
+            self._jobs.append(job)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="score-queue", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return True
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending)
+
+    def drain(self):
+        """Writes everything queued now, in the calling thread."""
+        while True:
+            batch = self._take()
+            if not batch:
+                return
+            self._write(batch)
+
+    def _take(self):
+        with self._cond:
+            batch, self._jobs = self._jobs[:self.max_batch], self._jobs[self.max_batch:]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                with self._cond:
+                    while not self._jobs:
+                        self._cond.wait()
+                time.sleep(self.interval)  # let the rest of the burst arrive
+                batch = self._take()
+                self._write(batch)
+            except Exception:
+                # Never let the thread die; put the batch back and try again
+                logger.exception("score queue iteration failed; retrying %d submissions", len(batch))
+                with self._cond:
+                    self._jobs[:0] = [job for job in batch if job.attempt_id in self._pending]
+                time.sleep(RETRY_DELAY)
+
+    def _write(self, batch):
+        if not batch:
+            return
+        with self.app.app_context():
+            try:
+                write_batch(batch)
+            except Exception:
+                db.session.rollback()
+                logger.exception("writing %d queued submissions failed; retrying one at a time", len(batch))
+                retry = []
+                for job in batch:
+                    try:
+                        write_batch([job])
+                    except OperationalError:  # locked or unavailable: keep it for the next round
+                        db.session.rollback()
+                        retry.append(job)
+                    except Exception:
+                        db.session.rollback()
+                        logger.exception("could not write queued submission of attempt %s", job.attempt_id)
+                        self._dead_letter(job)
+                        self._done([job])
+                self._done([job for job in batch if job not in retry])
+                if retry:
+                    with self._cond:
+                        self._jobs[:0] = retry
+                    time.sleep(RETRY_DELAY)
+                return
+        self._done(batch)
+
+    def _dead_letter(self, job):
+        """Records a submission that can't be written, for replay by hand."""
+        record = job._asdict() | {"submitted_at": job.submitted_at.isoformat()}
+        line = json.dumps(record)
+        logger.error("failed submission: %s", line)
+        if self.dead_letter_file:
+            try:
+                with open(self.dead_letter_file, "a", encoding="utf-8") as out:
+                    out.write(line + "\n")
+            except OSError:
+                logger.exception("could not append to %s", self.dead_letter_file)
+
+    def _done(self, jobs):
+        with self._cond:
+            for job in jobs:
+                self._pending.discard(job.attempt_id)
+
+
+def write_batch(batch):
+    """Stores a batch of submissions in one transaction, skipping attempts already submitted.
+
+    Returns the ids of the attempts stored.
+    """
+    stored = []
+    changed_keys = {versions.SCORES}
+    for job in batch:
+        if job.answers:
+            attempts.write_answers(job.attempt_id, job.answers)
+        if not attempts.mark_submitted(job.attempt_id, job.score, job.submitted_at):
+            continue
+        db.session.add(Score(
+            user_id=job.user_id, quiz_id=job.quiz_id, total_score=job.score,
+            timestamp_of_attempt=job.submitted_at, attempt_id=job.attempt_id,
+        ))
+        stats.record_score(job.user_id, job.quiz_id, job.score)
+        changed_keys.add(versions.user_key(job.user_id))
+        stored.append(job.attempt_id)
+    versions.bump(*sorted(changed_keys))
+    db.session.commit()
+    return stored
+
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = ScoreQueue(current_app._get_current_object())
+    return _queue
+
+
+def submission(info, score, answers=None):
+    """A ``Submission`` of the attempt, with the session's unsaved answers unless ``answers`` is given."""
+    if answers is None:
+        answers = dict(session.get('pending_answers') or {})
+    return Submission(info.id, info.user_id, info.quiz_id, score, answers, datetime.now(timezone.utc))
+
+
+def enqueue(info, score, answers=None):
+    """Queues the attempt (see ``submission``). Returns False if already queued."""
+    return get_queue().submit(submission(info, score, answers))
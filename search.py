@@ -0,0 +1,186 @@
+"""Full-text search over users, subjects, chapters, quizzes and questions.
+
+On SQLite the searchable columns are copied into one FTS5 table, ``search_index``.
+Triggers on the source tables keep it in sync inside the same transaction as
+every add/update/delete (including cascaded deletes), so the routes don't have
+to remember to touch it.  The rowid of each entry encodes ``(kind, id)`` so an
+update or delete only touches one index row.
+
+Other databases fall back to the old ``ilike`` scan.
+"""
+import re
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import joinedload
+
+from models import db, User, Subject, Chapter, Quiz, Question
+
+# kind -> (rowid tag, table, title column, body column)
+KINDS = {
+    "user": (1, "user", "username", "email"),
+    "subject": (2, "subject", "name", "description"),
+    "chapter": (3, "chapter", "name", None),
+    "quiz": (4, "quiz", "name", None),
+    "question": (5, "question", "question_title", "question_statement"),
+}
+KIND_MODELS = {"user": User, "subject": Subject, "chapter": Chapter, "quiz": Quiz, "question": Question}
+ROWID_STRIDE = 8  # rowid = id * 8 + tag
+
+
+def is_available():
+    return db.engine.dialect.name == "sqlite"
+
+
+def _column(alias, column):
+    return f"coalesce({alias}.{column}, '')" if column else "''"
+
+
+def _insert_sql(kind, alias):
+    tag, _, title, body = KINDS[kind]
+    return (
+        "INSERT INTO search_index(rowid, title, body, kind) "
+        f"VALUES ({alias}.id * {ROWID_STRIDE} + {tag}, {_column(alias, title)}, {_column(alias, body)}, '{kind}');"
+    )
+
+
+def _delete_sql(kind, alias):
+    tag = KINDS[kind][0]
+    return f"DELETE FROM search_index WHERE rowid = {alias}.id * {ROWID_STRIDE} + {tag};"
+
+
+def _trigger_ddl():
+    statements = []
+    for kind, (_, table, title, body) in KINDS.items():
+        watched = ", ".join(c for c in (title, body) if c)
+        statements += [
+            f'CREATE TRIGGER IF NOT EXISTS search_{kind}_ai AFTER INSERT ON "{table}" '
+            f"BEGIN {_insert_sql(kind, 'new')} END",
+            f'CREATE TRIGGER IF NOT EXISTS search_{kind}_au AFTER UPDATE OF {watched} ON "{table}" '
+            f"BEGIN {_delete_sql(kind, 'old')} {_insert_sql(kind, 'new')} END",
+            f'CREATE TRIGGER IF NOT EXISTS search_{kind}_ad AFTER DELETE ON "{table}" '
+            f"BEGIN {_delete_sql(kind, 'old')} END",
+        ]
+    return statements
+
+
+def init_search_index():
+    """Creates the FTS table and sync triggers; fills the index if it is new."""
+    if not is_available():
+        return
+
+    with db.engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")
+        ).first()
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+            "title, body, kind UNINDEXED, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        ))
+        for statement in _trigger_ddl():
+            conn.execute(text(statement))
+
+    if not exists:
+        rebuild_search_index()
+
+
+def rebuild_search_index():
+    """Re-creates every index entry from the source tables. Returns the row count."""
+    if not is_available():
+        return 0
+
+    with db.engine.begin() as conn:
+        conn.execute(text("DELETE FROM search_index"))
+        for kind, (tag, table, title, body) in KINDS.items():
+            conn.execute(text(
+                "INSERT INTO search_index(rowid, title, body, kind) "
+                f"SELECT id * {ROWID_STRIDE} + {tag}, {_column('t', title)}, {_column('t', body)}, '{kind}' "
+                f'FROM "{table}" AS t'
+            ))
+        return conn.execute(text("SELECT count(*) FROM search_index")).scalar()
+
+
+def to_match_expression(query):
+    """Turns free text into an FTS5 query: every word must match as a prefix."""
+    words = re.findall(r"\w+", query or "")
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search(query, kinds, page=1, per_page=25):
+    """Ranked search. Returns ``(hits, total)`` where hits is a list of (kind, id)."""
+    if not is_available():
+        return _like_search(query, kinds, page, per_page)
+
+    expression = to_match_expression(query)
+    if not expression or not kinds:
+        return [], 0
+
+    kind_list = ", ".join(f"'{kind}'" for kind in kinds if kind in KINDS)
+    where = f"search_index MATCH :expression AND kind IN ({kind_list})"
+    total = db.session.execute(
+        text(f"SELECT count(*) FROM search_index WHERE {where}"), {"expression": expression}
+    ).scalar()
+    rows = db.session.execute(
+        text(
+            f"SELECT kind, rowid / {ROWID_STRIDE} FROM search_index WHERE {where} "
+            "ORDER BY bm25(search_index, 10.0, 1.0) LIMIT :limit OFFSET :offset"
+        ),
+        {"expression": expression, "limit": per_page, "offset": (page - 1) * per_page},
+    ).all()
+    return [(kind, ref_id) for kind, ref_id in rows], total
+
+
+def matching_ids(query, kind):
+    """All ids of one kind matching the query (unranked), for use in an IN filter."""
+    if not is_available():
+        return [ref_id for _, ref_id in _like_search(query, [kind], 1, None)[0]]
+
+    expression = to_match_expression(query)
+    if not expression:
+        return []
+    return db.session.execute(
+        text(f"SELECT rowid / {ROWID_STRIDE} FROM search_index WHERE search_index MATCH :expression AND kind = :kind"),
+        {"expression": expression, "kind": kind},
+    ).scalars().all()
+
+
+def load_hits(hits):
+    """Loads the objects behind search hits, grouped by kind, keeping rank order."""
+    ids_by_kind = {kind: [] for kind in KINDS}
+    for kind, ref_id in hits:
+        ids_by_kind[kind].append(ref_id)
+
+    options = {
+        "chapter": [joinedload(Chapter.subject)],
+        "quiz": [joinedload(Quiz.chapter).joinedload(Chapter.subject)],
+    }
+
+    results = {}
+    for kind, ids in ids_by_kind.items():
+        if not ids:
+            results[kind] = []
+            continue
+        model = KIND_MODELS[kind]
+        objects = {obj.id: obj for obj in model.query.options(*options.get(kind, [])).filter(model.id.in_(ids))}
+        results[kind] = [objects[ref_id] for ref_id in ids if ref_id in objects]
+    return results
+
+
+def _like_search(query, kinds, page, per_page):
+    """Substring search for databases without FTS5 (unranked)."""
+    pattern = f"%{query}%"
+    hits = []
+    for kind in kinds:
+        if kind not in KINDS:
+            continue
+        model = KIND_MODELS[kind]
+        _, _, title, body = KINDS[kind]
+        condition = getattr(model, title).ilike(pattern)
+        if body:
+            condition = condition | getattr(model, body).ilike(pattern)
+        ids = db.session.execute(select(model.id).where(condition).order_by(model.id)).scalars()
+        hits += [(kind, ref_id) for ref_id in ids]
+
+    if per_page is None:
+        return hits, len(hits)
+    start = (page - 1) * per_page
+    return hits[start:start + per_page], len(hits)
@@ -0,0 +1,200 @@
+"""Rollup tables for the summary pages and leaderboards.
+
+``record_score`` updates the per-quiz, per-subject, per-user and per-user-quiz
+rollups and the per-quiz best-score histogram with atomic upserts in the
+caller's transaction, so the summary routes read a handful of rows instead of
+aggregating the whole Score history.
+``rebuild_stats`` / ``verify_stats`` backfill and check them against Score.
+"""
+from sqlalchemy import case, delete, func, insert, select, update
+
+from models import (
+    db, Subject, Chapter, Quiz, Score, QuizStat, SubjectStat, UserStat, UserQuizStat, QuizScoreBucket, upsert,
+)
+
+ROLLUPS = (QuizStat, SubjectStat, UserStat, UserQuizStat, QuizScoreBucket)
+
+
+def _least(column, value):
+    return case((column.is_(None), value), (column > value, value), else_=column)
+
+
+def _greatest(column, value):
+    return case((column.is_(None), value), (column < value, value), else_=column)
+
+
+def record_score(user_id, quiz_id, score, subject_id=None):
+    """Adds one attempt to every rollup. Call before committing the new Score."""
+    score = score or 0
+    if subject_id is None:
+        subject_id = (
+            db.session.query(Chapter.subject_id)
+            .join(Quiz, Quiz.chapter_id == Chapter.id)
+            .filter(Quiz.id == quiz_id)
+            .scalar()
+        )
+
+    db.session.execute(upsert(
+        QuizStat,
+        {"quiz_id": quiz_id, "attempt_count": 1, "score_sum": score, "min_score": score, "max_score": score},
+        index_elements=["quiz_id"],
+        set_={
+            "attempt_count": QuizStat.attempt_count + 1,
+            "score_sum": QuizStat.score_sum + score,
+            "min_score": _least(QuizStat.min_score, score),
+            "max_score": _greatest(QuizStat.max_score, score),
+        },
+    ))
+    previous_best = db.session.execute(
+        select(UserQuizStat.max_score).where(UserQuizStat.user_id == user_id, UserQuizStat.quiz_id == quiz_id)
+    ).scalar()
+    if previous_best is None or score > previous_best:
+        _move_best_score(quiz_id, previous_best, score)
+
+    db.session.execute(upsert(
+        UserQuizStat,
+        {"user_id": user_id, "quiz_id": quiz_id, "attempt_count": 1, "score_sum": score,
+         "min_score": score, "max_score": score},
+        index_elements=["user_id", "quiz_id"],
+        set_={
+            "attempt_count": UserQuizStat.attempt_count + 1,
+            "score_sum": UserQuizStat.score_sum + score,
+            "min_score": _least(UserQuizStat.min_score, score),
+            "max_score": _greatest(UserQuizStat.max_score, score),
+        },
+    ))
+    db.session.execute(upsert(
+        UserStat,
+        {"user_id": user_id, "attempt_count": 1, "score_sum": score},
+        index_elements=["user_id"],
+        set_={"attempt_count": UserStat.attempt_count + 1, "score_sum": UserStat.score_sum + score},
+    ))
+    if subject_id is not None:
+        db.session.execute(upsert(
+            SubjectStat,
+            {"subject_id": subject_id, "attempt_count": 1},
+            index_elements=["subject_id"],
+            set_={"attempt_count": SubjectStat.attempt_count + 1},
+        ))
+
+
+def _move_best_score(quiz_id, previous_best, best):
+    """Moves one user between buckets of the quiz's best-score histogram."""
+    if previous_best is not None:
+        db.session.execute(
+            update(QuizScoreBucket)
+            .where(QuizScoreBucket.quiz_id == quiz_id, QuizScoreBucket.score == previous_best)
+            .values(user_count=QuizScoreBucket.user_count - 1)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.execute(upsert(
+        QuizScoreBucket,
+        {"quiz_id": quiz_id, "score": best, "user_count": 1},
+        index_elements=["quiz_id", "score"],
+        set_={"user_count": QuizScoreBucket.user_count + 1},
+    ))
+
+
+def forget_quizzes(quiz_ids):
+    """Takes the attempts of quizzes about to be deleted out of the rollups.
+
+    ``quiz_ids`` may be a list or a ``select()`` of quiz ids.
+    """
+    def user_totals(column):
+        return (
+            select(func.coalesce(func.sum(column), 0))
+            .where(UserQuizStat.user_id == UserStat.user_id, UserQuizStat.quiz_id.in_(quiz_ids))
+            .scalar_subquery()
+        )
+
+    user_rows = select(UserQuizStat.user_id).where(UserQuizStat.quiz_id.in_(quiz_ids))
+    db.session.execute(
+        update(UserStat)
+        .where(UserStat.user_id.in_(user_rows))
+        .values(
+            attempt_count=UserStat.attempt_count - user_totals(UserQuizStat.attempt_count),
+            score_sum=UserStat.score_sum - user_totals(UserQuizStat.score_sum),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    subject_attempts = (
+        select(func.coalesce(func.sum(QuizStat.attempt_count), 0))
+        .join(Quiz, Quiz.id == QuizStat.quiz_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .where(Chapter.subject_id == SubjectStat.subject_id, QuizStat.quiz_id.in_(quiz_ids))
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(SubjectStat)
+        .values(attempt_count=SubjectStat.attempt_count - subject_attempts)
+        .execution_options(synchronize_session=False)
+    )
+
+    db.session.execute(delete(QuizScoreBucket).where(QuizScoreBucket.quiz_id.in_(quiz_ids)).execution_options(synchronize_session=False))
+    db.session.execute(delete(UserQuizStat).where(UserQuizStat.quiz_id.in_(quiz_ids)).execution_options(synchronize_session=False))
+    db.session.execute(delete(QuizStat).where(QuizStat.quiz_id.in_(quiz_ids)).execution_options(synchronize_session=False))
+
+
+def _expected():
+    """The rollups recomputed from Score, as (model, columns, select) triples.
+
+    Only scores of quizzes still in the catalog (quiz, chapter and subject all
+    present) are counted, like the summaries did.
+    """
+    scores = (
+        select(Score)
+        .join(Quiz, Quiz.id == Score.quiz_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .join(Subject, Subject.id == Chapter.subject_id)
+        .subquery()
+    )
+    score = func.coalesce(scores.c.total_score, 0)
+    best = (
+        select(scores.c.quiz_id, func.max(score).label("best"))
+        .group_by(scores.c.user_id, scores.c.quiz_id)
+        .subquery()
+    )
+    return [
+        (QuizStat, ["quiz_id", "attempt_count", "score_sum", "min_score", "max_score"],
+         select(scores.c.quiz_id, func.count(scores.c.id), func.sum(score), func.min(score), func.max(score))
+         .group_by(scores.c.quiz_id)),
+        (SubjectStat, ["subject_id", "attempt_count"],
+         select(Chapter.subject_id, func.count(scores.c.id))
+         .join(Quiz, Quiz.chapter_id == Chapter.id)
+         .join(scores, scores.c.quiz_id == Quiz.id)
+         .group_by(Chapter.subject_id)),
+        (UserStat, ["user_id", "attempt_count", "score_sum"],
+         select(scores.c.user_id, func.count(scores.c.id), func.sum(score))
+         .group_by(scores.c.user_id)),
+        (UserQuizStat, ["user_id", "quiz_id", "attempt_count", "score_sum", "min_score", "max_score"],
+         select(scores.c.user_id, scores.c.quiz_id, func.count(scores.c.id), func.sum(score), func.min(score), func.max(score))
+         .group_by(scores.c.user_id, scores.c.quiz_id)),
+        (QuizScoreBucket, ["quiz_id", "score", "user_count"],
+         select(best.c.quiz_id, best.c.best, func.count())
+         .group_by(best.c.quiz_id, best.c.best)),
+    ]
+
+
+def rebuild_stats():
+    """Backfills every rollup from the Score table in one transaction."""
+    for model, columns, query in _expected():
+        db.session.execute(delete(model))
+        db.session.execute(insert(model).from_select(columns, query))
+    db.session.commit()
+
+
+def verify_stats():
+    """Compares the rollups with Score. Returns a list of mismatch descriptions."""
+    problems = []
+    for model, columns, query in _expected():
+        expected = {tuple(row) for row in db.session.execute(query)}
+        actual_query = select(*[getattr(model, column) for column in columns])
+        # Rows left at zero (e.g. after deleting every score of a user) are not drift
+        count = model.user_count if model is QuizScoreBucket else model.attempt_count
+        actual = {tuple(row) for row in db.session.execute(actual_query.where(count != 0))}
+        for row in sorted(expected - actual, key=str):
+            problems.append(f"{model.__tablename__}: expected {row}")
+        for row in sorted(actual - expected, key=str):
+            problems.append(f"{model.__tablename__}: unexpected {row}")
+    return problems
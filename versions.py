@@ -0,0 +1,91 @@
+"""Data version counters used to key caches.
+
+Each key ("catalog", "scores", "user:<id>") is a row in ``data_version`` whose
+number goes up in the same transaction as the change it describes, so every
+worker sees a new version as soon as the change is committed.
+
+``stamp`` serves a key's version and change time from a short-lived
+in-process cache, for the conditional GETs in http_cache.py; this worker's own
+bumps evict it on commit, and ``VERSION_STAMP_TTL`` bounds staleness for the
+others.
+"""
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from cache import LRUCache
+from models import db, DataVersion, upsert
+
+CATALOG = "catalog"  # subjects, chapters, quizzes and questions
+SCORES = "scores"    # any new score
+
+_cache = None
+
+
+def user_key(user_id):
+    return f"user:{user_id}"
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(maxsize=1024, ttl=current_app.config["VERSION_STAMP_TTL"])
+    return _cache
+
+
+def bump(*keys):
+    """Increments the given versions; commits with the caller's transaction."""
+    now = datetime.now(timezone.utc)
+    db.session.info.setdefault("bumped_versions", set()).update(keys)
+    for key in keys:
+        db.session.execute(upsert(
+            DataVersion,
+            {"key": key, "version": 1, "updated_at": now},
+            index_elements=["key"],
+            set_={"version": DataVersion.version + 1, "updated_at": now},
+        ))
+
+
+def get_versions(*keys):
+    """Returns ``{key: version}``; keys that were never bumped are at version 0."""
+    rows = db.session.query(DataVersion.key, DataVersion.version).filter(DataVersion.key.in_(keys)).all()
+    versions = dict.fromkeys(keys, 0)
+    versions.update(rows)
+    return versions
+
+
+def version_token(*keys):
+    """A short string identifying the current versions of ``keys``, for URLs and cache keys."""
+    versions = get_versions(*keys)
+    return "-".join(str(versions[key]) for key in keys)
+
+
+def stamp(key):
+    """``(version, updated_at)`` of one key, at most VERSION_STAMP_TTL seconds old.
+
+    ``updated_at`` is an aware UTC datetime, or None if the key was never bumped.
+    """
+    def load():
+        row = db.session.query(DataVersion.version, DataVersion.updated_at).filter(DataVersion.key == key).first()
+        if row is None:
+            return 0, None
+        version, updated_at = row
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)  # SQLite drops the offset
+        return version, updated_at
+    return get_cache().get_or_create(key, load)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_committed(session):
+    keys = session.info.pop("bumped_versions", None)
+    if keys and _cache is not None:
+        for key in keys:
+            _cache.pop(key)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session):
+    session.info.pop("bumped_versions", None)